@@ -0,0 +1,131 @@
+"""
+Paginated book listings.
+
+Books are listed by title, BOOKS_PER_PAGE at a time (?limit= up to
+MAX_BOOKS_PER_PAGE). Pages are navigated by keyset: ?after=<pk of the last
+book shown> continues after that book, and ?before=<pk of the first book
+shown> goes back to the books before it, so every page costs the same query
+however deep it is. An unknown book in either is not found (404).
+
+With ?fragment=1 the page is returned as JSON, {"html": <rendered rows>,
+"next": <query string of the next page or null>, "previous": <same for the
+previous page>}, for infinite scrolling.
+
+Function views call render_book_list(); class-based ListViews use
+KeysetBookListMixin. Both need a template for the rows alone, which the full
+page template includes.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+
+BOOKS_PER_PAGE = 25
+MAX_BOOKS_PER_PAGE = 100
+KEYSET_PARAM = 'after'
+PREVIOUS_PARAM = 'before'
+FRAGMENT_PARAM = 'fragment'
+
+
+def get_page_size(request):
+    try:
+        size = int(request.GET.get('limit', BOOKS_PER_PAGE))
+    except ValueError:
+        return BOOKS_PER_PAGE
+    return max(1, min(size, MAX_BOOKS_PER_PAGE))
+
+
+def book_title(queryset, pk):
+    try:
+        title = queryset.model._default_manager.filter(pk=pk).values_list('title', flat=True).first()
+    except (ValueError, ValidationError):
+        title = None
+    if title is None:
+        raise Http404('Unknown book.')
+    return title
+
+
+def books_after(queryset, after):
+    """Books sorting after the book with pk `after`, by (title, pk)."""
+    title = book_title(queryset, after)
+    return queryset.filter(Q(title__gt=title) | Q(title=title, pk__gt=after))
+
+
+def books_before(queryset, before):
+    """Books sorting before the book with pk `before`, by (title, pk)."""
+    title = book_title(queryset, before)
+    return queryset.filter(Q(title__lt=title) | Q(title=title, pk__lt=before))
+
+
+def page_url(request, param, pk):
+    params = request.GET.copy()
+    for name in (KEYSET_PARAM, PREVIOUS_PARAM, FRAGMENT_PARAM):
+        params.pop(name, None)
+    params[param] = pk
+    return '?' + params.urlencode()
+
+
+def paginate_books(request, queryset):
+    """
+    Returns the books of the requested page and the query strings of the next
+    and the previous pages (None at either end).
+    """
+    per_page = get_page_size(request)
+    after = request.GET.get(KEYSET_PARAM)
+    before = request.GET.get(PREVIOUS_PARAM)
+    if before and not after:
+        # Read backwards from the book, then put back in order
+        books = list(books_before(queryset, before).order_by('-title', '-pk')[:per_page + 1])
+        more_before, more_after = len(books) > per_page, True
+        books = books[:per_page][::-1]
+    else:
+        queryset = queryset.order_by('title', 'pk')
+        if after:
+            queryset = books_after(queryset, after)
+        # One extra row tells whether there is a next page
+        books = list(queryset[:per_page + 1])
+        more_before, more_after = bool(after), len(books) > per_page
+        books = books[:per_page]
+
+    if not books:
+        return books, None, None
+    next_url = page_url(request, KEYSET_PARAM, books[-1].pk) if more_after else None
+    previous_url = page_url(request, PREVIOUS_PARAM, books[0].pk) if more_before else None
+    return books, next_url, previous_url
+
+
+def is_fragment_request(request):
+    return bool(request.GET.get(FRAGMENT_PARAM))
+
+
+def book_fragment_response(request, rows_template_name, context):
+    return JsonResponse({
+        'html': render_to_string(rows_template_name, context, request),
+        'next': context['next_url'],
+        'previous': context['previous_url'],
+    })
+
+
+def render_book_list(request, template_name, rows_template_name, queryset, context=None):
+    """Renders a page of `queryset`, as a page or as a JSON fragment."""
+    books, next_url, previous_url = paginate_books(request, queryset)
+    context = {**(context or {}), 'books': books, 'next_url': next_url, 'previous_url': previous_url}
+    if is_fragment_request(request):
+        return book_fragment_response(request, rows_template_name, context)
+    return render(request, template_name, context)
+
+
+class KeysetBookListMixin:
+    """ListView mixin: keyset pages of the view's queryset, see render_book_list()."""
+    rows_template_name = None
+
+    def get_context_data(self, **kwargs):
+        books, next_url, previous_url = paginate_books(self.request, self.object_list)
+        return super().get_context_data(
+            object_list=books, next_url=next_url, previous_url=previous_url, **kwargs)
+
+    def render_to_response(self, context, **response_kwargs):
+        if is_fragment_request(self.request):
+            return book_fragment_response(self.request, self.rows_template_name, context)
+        return super().render_to_response(context, **response_kwargs)
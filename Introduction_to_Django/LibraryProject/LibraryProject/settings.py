@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from LibraryProject.sqlite import parse_pragmas, sqlite_options
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -55,9 +58,16 @@ ROOT_URLCONF = 'LibraryProject.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
-        'APP_DIRS': True,
+        'DIRS': [BASE_DIR / 'templates'],
         'OPTIONS': {
+            # Parsed templates are kept in memory (also with DEBUG = True;
+            # edited templates are picked up by the autoreloader)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -73,14 +83,34 @@ WSGI_APPLICATION = 'LibraryProject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite tuned for concurrent requests (see LibraryProject/sqlite.py), pragmas can be
+# changed with e.g. SQLITE_PRAGMAS=synchronous=FULL,mmap_size=0
+SQLITE_PRAGMAS = parse_pragmas(os.getenv('SQLITE_PRAGMAS', ''))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': sqlite_options(**SQLITE_PRAGMAS),
     }
 }
 
 
+# Cache shared by the worker processes, e.g. CACHE_URL=redis://127.0.0.1:6379/0
+# (needs redis-py). Without it each process has its own cache, and the cached book pages are
+# kept a few seconds only (see LibraryProject/caches.py)
+CACHE_URL = os.getenv('CACHE_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
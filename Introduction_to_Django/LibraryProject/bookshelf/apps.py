@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BookshelfConfig(AppConfig):
     name = 'bookshelf'
+
+    def ready(self):
+        # Registers the signal handlers that drop cached pages
+        from . import caching  # noqa: F401
@@ -0,0 +1,23 @@
+"""
+Caching for the book list pages.
+
+- Whole pages are cached for anonymous visitors (LibraryProject.page_cache,
+  namespace PAGE_NAMESPACE), and dropped whenever a book is saved or deleted.
+- Each book row is cached per book id and Book.updated stamp (the
+  'bookshelf_book_row' fragment), so an edited book gets a new key.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from LibraryProject.page_cache import invalidate_pages
+
+from .models import Book
+
+BOOK_ROW_CACHE_TIMEOUT = 60 * 60 * 24
+PAGE_NAMESPACE = 'bookshelf'
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, instance, **kwargs):
+    invalidate_pages(PAGE_NAMESPACE)
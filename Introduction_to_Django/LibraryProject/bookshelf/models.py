@@ -6,6 +6,8 @@ class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.CharField(max_length=100)
     publication_year = models.IntegerField()
+    # Part of the template fragment cache keys of the book
+    updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -1,3 +1,190 @@
-from django.test import TestCase
+import json
+
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import path
+
+from .models import Book
+from .views import BookListView, book_list_view
+
+
+def add_message(request):
+    messages.info(request, 'Book saved.')
+    return HttpResponse()
+
+
+urlpatterns = [
+    path('books/', book_list_view),
+    path('message/', add_message),
+]
+
+
+class KeysetBookListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        # Two books per title: the pk breaks the ties
+        self.books = [
+            Book.objects.create(title=title, author='Author', publication_year=2000)
+            for title in ('Dune', 'Emma', 'Dune', 'Beloved', 'Emma', 'Beloved')
+        ]
+        self.ordered = sorted(self.books, key=lambda book: (book.title, book.pk))
+
+    def get(self, query=''):
+        request = self.factory.get('/books/' + query)
+        request.user = AnonymousUser()
+        response = BookListView.as_view()(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_next_pages(self):
+        response = self.get('?limit=4')
+        self.assertEqual(list(response.context_data['books']), self.ordered[:4])
+        self.assertIsNone(response.context_data['previous_url'])
+
+        response = self.get(response.context_data['next_url'])
+
+        self.assertEqual(list(response.context_data['books']), self.ordered[4:])
+        self.assertIsNone(response.context_data['next_url'])
+        self.assertEqual(response.context_data['previous_url'], f'?limit=4&before={self.ordered[4].pk}')
+
+    def test_previous_pages(self):
+        response = self.get(f'?limit=2&before={self.ordered[4].pk}')
+
+        self.assertEqual(list(response.context_data['books']), self.ordered[2:4])
+        self.assertEqual(response.context_data['next_url'], f'?limit=2&after={self.ordered[3].pk}')
+
+        response = self.get(response.context_data['previous_url'])
+
+        self.assertEqual(list(response.context_data['books']), self.ordered[:2])
+        self.assertIsNone(response.context_data['previous_url'])
+
+    def test_ties_are_neither_skipped_nor_repeated(self):
+        seen = []
+        query = '?limit=1'
+        while query:
+            response = self.get(query)
+            seen += response.context_data['books']
+            query = response.context_data['next_url']
+
+        self.assertEqual(seen, self.ordered)
+
+    def test_fragment_has_both_cursors(self):
+        response = self.get(f'?limit=2&after={self.ordered[1].pk}&fragment=1')
+
+        data = json.loads(response.content)
+        self.assertEqual(data['next'], f'?limit=2&after={self.ordered[3].pk}')
+        self.assertEqual(data['previous'], f'?limit=2&before={self.ordered[2].pk}')
+
+    def test_tampered_cursor(self):
+        for query in ('?after=999', '?after=abc', '?before=999', '?before=1%27'):
+            with self.subTest(query=query), self.assertRaises(Http404):
+                self.get(query)
+
+
+class BookPageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.book = Book.objects.create(title='Dune', author='Frank Herbert', publication_year=1965)
+
+    def get(self, user=None):
+        request = self.factory.get('/books/')
+        request.user = user or AnonymousUser()
+        response = BookListView.as_view()(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_page_is_served_from_cache(self):
+        self.assertContains(self.get(), 'Dune')
+
+        with self.assertNumQueries(0):
+            response = self.get()
+
+        self.assertContains(response, 'Dune')
+
+    def test_saved_book_drops_cached_pages(self):
+        self.get()
+        self.book.title = 'Dune Messiah'
+        self.book.save()
+
+        self.assertContains(self.get(), 'Dune Messiah')
+
+    def test_deleted_book_drops_cached_pages(self):
+        self.get()
+        self.book.delete()
+
+        self.assertNotContains(self.get(), 'Dune')
+
+    def test_authenticated_users_are_not_cached(self):
+        from django.contrib.auth.models import User
+
+        user = User.objects.create_user('reader', password='password123')
+        self.get(user)
+
+        with self.assertNumQueries(1):
+            self.get(user)
+
+    def test_function_view_lists_books_from_cache(self):
+        request = self.factory.get('/my_books/')
+        request.user = AnonymousUser()
+        self.assertContains(book_list_view(request), 'Dune by Frank Herbert')
+
+        with self.assertNumQueries(0):
+            response = book_list_view(request)
+
+        self.assertContains(response, 'Dune by Frank Herbert')
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class BookPageCacheMiddlewareTests(TestCase):
+    """Through the whole middleware stack, which adds the session and messages cookies."""
+
+    def setUp(self):
+        cache.clear()
+        Book.objects.create(title='Dune', author='Frank Herbert', publication_year=1965)
+
+    def assertCached(self, cached):
+        # A new visitor
+        self.client.cookies.clear()
+        with self.assertNumQueries(0 if cached else 1):
+            self.assertContains(self.client.get('/books/'), 'Dune')
+
+    def test_anonymous_page_is_cached(self):
+        self.client.get('/books/')
+
+        self.assertCached(True)
+
+    def test_visitor_with_session_data_is_not_cached(self):
+        session = self.client.session
+        session['recently_viewed'] = [1]
+        session.save()
+
+        self.client.get('/books/')
+
+        self.assertCached(False)
+
+    def test_visitor_with_messages_is_not_cached(self):
+        self.assertIn('messages', self.client.get('/message/').cookies)
+
+        response = self.client.get('/books/')
+
+        # The message is still pending, for a page that shows it
+        self.assertNotIn('messages', response.cookies)
+        self.assertIn('messages', self.client.cookies)
+        self.assertCached(False)
+
+    def test_cached_page_is_not_served_to_visitors_with_messages(self):
+        self.client.get('/books/')
+        self.client.get('/message/')
+
+        with self.assertNumQueries(1):
+            self.client.get('/books/')
 
-# Create your tests here.
@@ -5,17 +5,26 @@ from django.contrib import messages
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import reverse_lazy
 from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from LibraryProject.book_listing import KeysetBookListMixin, render_book_list
+from LibraryProject.page_cache import cache_anonymous_page
+from .caching import BOOK_ROW_CACHE_TIMEOUT, PAGE_NAMESPACE
 
 # Create your views here.
+@cache_anonymous_page(PAGE_NAMESPACE)
 def book_list_view(request):
-    books = Book.objects.all()
-    context = {'books_data': books}
-    return render(request, 'books.html', context)
+    # Keyset paginated, see LibraryProject.book_listing
+    context = {'book_row_cache_timeout': BOOK_ROW_CACHE_TIMEOUT}
+    return render_book_list(request, 'books.html', 'book_rows.html', Book.objects.all(), context)
 
-class BookListView(ListView):
+@method_decorator(cache_anonymous_page(PAGE_NAMESPACE), name='dispatch')
+class BookListView(KeysetBookListMixin, ListView):
+    # Keyset paginated, see LibraryProject.book_listing
     model = Book
     template_name = 'book.html'
+    rows_template_name = 'book_rows.html'
     context_object_name = 'books'
+    extra_context = {'book_row_cache_timeout': BOOK_ROW_CACHE_TIMEOUT}
 
 class BookTemplateView(TemplateView):
     template_name = 'books.html'
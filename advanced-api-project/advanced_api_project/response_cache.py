@@ -0,0 +1,100 @@
+"""
+Response caching for list endpoints, without stampedes.
+
+Views with CachedListMixin serve list() from the cache: the serialized data
+is stored per namespace version and request URL for `cache_timeout`
+seconds. The apps drop every cached response of a namespace at once with
+invalidate_responses(namespace), from their model signals.
+
+An expiring entry does not send every concurrent request to the database:
+
+- Probabilistic early expiration (XFetch): each request recomputes the entry
+  ahead of its expiry with a probability that grows as the expiry nears, and
+  with the time the last computation took (delta), when
+  now - delta * beta * log(random()) >= expiry. Under load one request
+  refreshes the entry early while the others keep serving it; a larger
+  `cache_beta` refreshes earlier.
+- Single-flight (see singleflight.py): identical requests that miss together
+  wait for one computation in the process, and a request picked for an early
+  refresh while another one is refreshing serves the cached entry instead.
+
+The cached data is the same for every user: only use the mixin on views
+whose response depends on nothing but the URL.
+
+Other worker processes only see a version bump through a shared cache
+(CACHE_URL): with a per-process cache, responses are only kept a few
+seconds (see caches.py).
+"""
+import hashlib
+import math
+import random
+import time
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .caches import cache_timeout
+from .singleflight import SingleFlight
+
+RESPONSE_CACHE_TIMEOUT = 60
+
+_flight = SingleFlight()
+
+
+def response_version_key(namespace):
+    return f'responses:{namespace}:version'
+
+
+def get_response_version(namespace):
+    version = cache.get(response_version_key(namespace))
+    if version is None:
+        version = 1
+        cache.add(response_version_key(namespace), version, None)
+    return version
+
+
+def invalidate_responses(namespace):
+    try:
+        cache.incr(response_version_key(namespace))
+    except ValueError:
+        cache.set(response_version_key(namespace), 2, None)
+
+
+def response_cache_key(namespace, request):
+    url = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False).hexdigest()
+    return f'responses:{namespace}:{get_response_version(namespace)}:{url}'
+
+
+def recompute(key, compute, timeout):
+    timeout = cache_timeout(timeout)
+    start = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - start
+    cache.set(key, (value, delta, time.time() + timeout), timeout)
+    return value
+
+
+def get_or_compute(key, compute, timeout=RESPONSE_CACHE_TIMEOUT, beta=1.0):
+    """The cached value of `key`, or compute()'s, see the module docstring."""
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expiry = entry
+        # 1 - random() is in (0, 1]
+        if time.time() - delta * beta * math.log(1 - random.random()) < expiry or _flight.running(key):
+            return value
+    return _flight.do(key, lambda: recompute(key, compute, timeout))
+
+
+class CachedListMixin:
+    """ListAPIView mixin, see the module docstring."""
+    cache_namespace = None
+    cache_timeout = RESPONSE_CACHE_TIMEOUT
+    cache_beta = 1.0
+
+    def list(self, request, *args, **kwargs):
+        data = get_or_compute(
+            response_cache_key(self.cache_namespace, request),
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs).data,
+            self.cache_timeout, self.cache_beta,
+        )
+        return Response(data)
@@ -0,0 +1,54 @@
+"""
+Request coalescing.
+
+SingleFlight.do(key, func) runs func() once for all the threads calling it
+with the same key at the same time: the first caller runs it, the others
+wait and get its result, or its exception. A call made after it returns
+runs func() again: combine it with a cache.
+"""
+import threading
+
+
+class Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """See the module docstring."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def running(self, key):
+        """Whether a call for `key` is in flight."""
+        with self.lock:
+            return key in self.calls
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        # Registers the signal handlers that drop cached book lists
+        from . import caching  # noqa: F401
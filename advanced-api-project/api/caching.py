@@ -0,0 +1,19 @@
+"""
+Caching for the book list (advanced_api_project.response_cache, namespace
+BOOK_NAMESPACE): every cached list is dropped whenever a book is saved or
+deleted.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from advanced_api_project.response_cache import invalidate_responses
+
+from .models import Book
+
+BOOK_NAMESPACE = 'books'
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, instance, **kwargs):
+    invalidate_responses(BOOK_NAMESPACE)
@@ -2,9 +2,10 @@ from rest_framework import serializers
 from .models import Book
 from .models import Author
 from django.utils import timezone
+from advanced_api_project.fieldsets import SparseFieldsetSerializerMixin
 
-# Book serializer for the Book model
-class BookSerializer(serializers.ModelSerializer):
+# Book serializer for the Book model (supports ?fields= / ?exclude=)
+class BookSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ['title', 'publication_year', 'author']
@@ -19,10 +20,19 @@ class BookSerializer(serializers.ModelSerializer):
         return data
 
 # Author serializer for the Author model
+# Expects authors loaded with the 'latest_books' prefetch (see AuthorQuerysetMixin)
 class AuthorSerializer(serializers.ModelSerializer):
-    books = BookSerializer(many=True, read_only=True)
+    books = BookSerializer(many=True, read_only=True, source='latest_books')
 
     class Meta:
         model = Author
-        fields = ['name', 'books']
+        fields = ['id', 'name', 'books']
+
+# Sparse author serializer: only the number of books, no nested rows
+class AuthorBookCountSerializer(serializers.ModelSerializer):
+    book_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Author
+        fields = ['id', 'name', 'book_count']
 
@@ -75,6 +75,12 @@ class TestBookAPI(APITestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['title'], 'One Piece')
 
+    def test_sparse_fieldset(self):
+        """Test ?fields= limits the serialized fields"""
+        response = self.client.get(f"{self.list_url}?fields=title")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {'title'})
+
     # --- PERMISSION TESTS ---
 
     def test_unauthenticated_cannot_create(self):
@@ -82,4 +88,128 @@ class TestBookAPI(APITestCase):
         self.client.logout()
         data = {"title": "Ghost Book", "author": self.author.id, "publication_year": 2025}
         response = self.client.post(self.list_url, data)
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class TestAuthorAPI(APITestCase):
+
+    def setUp(self):
+        self.authors = [Author.objects.create(name=f'Author {i}') for i in range(3)]
+        for author in self.authors:
+            for year in range(2000, 2015):
+                Book.objects.create(title=f'{author.name} {year}', author=author, publication_year=year)
+
+        self.list_url = reverse('author-list')
+
+    def test_list_authors_uses_fixed_number_of_queries(self):
+        """Authors and their books are loaded in two queries"""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+
+    def test_books_are_ordered_and_capped(self):
+        """Each author shows at most MAX_BOOKS_PER_AUTHOR books, newest first"""
+        from .views import MAX_BOOKS_PER_AUTHOR
+        response = self.client.get(reverse('author-detail', kwargs={'pk': self.authors[0].id}))
+        books = response.data['books']
+        self.assertEqual(len(books), MAX_BOOKS_PER_AUTHOR)
+        self.assertEqual(books[0]['publication_year'], 2014)
+
+    def test_book_count_only_mode(self):
+        """?books=count returns a count instead of nested books"""
+        with self.assertNumQueries(1):
+            response = self.client.get(f"{self.list_url}?books=count")
+        self.assertEqual(response.data[0]['book_count'], 15)
+        self.assertNotIn('books', response.data[0])
+
+
+class TestBookListCache(APITestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.author = Author.objects.create(name='Emma')
+        self.book = Book.objects.create(title='One Piece', author=self.author, publication_year=2022)
+        self.list_url = reverse('book-list')
+
+    def test_list_is_served_from_cache(self):
+        """A repeated list request runs no query"""
+        self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.data[0]['title'], 'One Piece')
+
+    def test_saved_book_drops_cached_lists(self):
+        """Saving a book drops the cached lists"""
+        self.client.get(self.list_url)
+        self.book.title = 'Two Piece'
+        self.book.save()
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.data[0]['title'], 'Two Piece')
+
+    def test_early_expiration(self):
+        """An entry is recomputed before it expires, sooner the longer it took"""
+        import time
+        from unittest import mock
+        from django.core.cache import cache
+        from advanced_api_project.response_cache import get_or_compute
+
+        # Took 10 s to compute, expires in 60 s
+        cache.set('key', ('first', 10.0, time.time() + 60), 60)
+        with mock.patch('advanced_api_project.response_cache.random.random', return_value=0.5):
+            self.assertEqual(get_or_compute('key', lambda: 'second', timeout=60), 'first')
+        with mock.patch('advanced_api_project.response_cache.random.random', return_value=0.999999):
+            self.assertEqual(get_or_compute('key', lambda: 'second', timeout=60), 'second')
+
+    def test_per_process_cache_keeps_entries_briefly(self):
+        """Other processes miss the invalidation of a per-process cache, so its entries expire soon"""
+        from django.test import override_settings
+        from advanced_api_project.caches import LOCAL_CACHE_TIMEOUT, cache_timeout
+
+        self.assertEqual(cache_timeout(60), LOCAL_CACHE_TIMEOUT)
+        self.assertEqual(cache_timeout(None), LOCAL_CACHE_TIMEOUT)
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/0'}}):
+            self.assertEqual(cache_timeout(60), 60)
+
+    def test_identical_requests_compute_once(self):
+        """Concurrent misses of one URL wait for a single computation"""
+        import threading
+        import time
+        from unittest import mock
+        from rest_framework.mixins import ListModelMixin
+        from rest_framework.response import Response
+        from rest_framework.test import APIRequestFactory
+        from advanced_api_project import response_cache
+        from .views import BookListView
+
+        callers = 5
+        barrier = threading.Barrier(callers)
+        calls = []
+
+        def compute(view, request, *args, **kwargs):
+            calls.append(1)
+            # Blocked until every other caller waits on this computation
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and sum(
+                    len(call.done._cond._waiters) for call in list(response_cache._flight.calls.values())
+            ) < callers - 1:
+                time.sleep(0.001)
+            return Response(['books'])
+
+        view = BookListView.as_view()
+        factory = APIRequestFactory()
+        results = []
+
+        def request():
+            barrier.wait()
+            results.append(view(factory.get(self.list_url)).data)
+
+        threads = [threading.Thread(target=request) for _ in range(callers)]
+        with mock.patch.object(ListModelMixin, 'list', compute):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['books']] * callers)
@@ -3,21 +3,31 @@ from rest_framework.permissions import AllowAny,IsAuthenticatedOrReadOnly, IsAut
 from .models import Book
 from .serializers import BookSerializer
 from django_filters import rest_framework
+from django.db.models import Count, Prefetch
 
 # Step 1: List all books (Public Read-Only)
 from rest_framework import generics, filters
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from .models import Book
-from .serializers import BookSerializer
+from .models import Book, Author
+from .serializers import BookSerializer, AuthorSerializer, AuthorBookCountSerializer
+from advanced_api_project.fieldsets import SparseFieldsetMixin
+from advanced_api_project.replicas import ReplicaReadMixin
+from advanced_api_project.response_cache import CachedListMixin
+from .caching import BOOK_NAMESPACE
+
+# Maximum number of books nested under each author
+MAX_BOOKS_PER_AUTHOR = 10
 
 
-class BookListView(generics.ListAPIView):
+class BookListView(ReplicaReadMixin, CachedListMixin, SparseFieldsetMixin, generics.ListAPIView):
     serializer_class = BookSerializer
     permission_classes = [AllowAny]
+    # Cached per URL, see advanced_api_project/response_cache.py
+    cache_namespace = BOOK_NAMESPACE
 
     # 1. Define Filter Backends as Class Attributes
     # This enables built-in Search and Ordering alongside your custom filtering
-    filter_backends = [rest_framework, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [rest_framework.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
 
     # Configuration for built-in SearchFilter
     search_fields = ['title', 'author', 'publication_year']
@@ -49,7 +59,7 @@ class BookListView(generics.ListAPIView):
         return queryset
 
 # Step 1: Retrieve single book (Public Read-Only)
-class BookDetailView(generics.RetrieveAPIView):
+class BookDetailView(SparseFieldsetMixin, generics.RetrieveAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -86,3 +96,41 @@ class BookDeleteView(generics.DestroyAPIView):
 
 
 
+
+
+
+# Authors with their books nested (Public Read-Only)
+class AuthorQuerysetMixin:
+    """
+    Loads authors and their books in two queries, whatever the number of authors.
+    Use ?books=count to get only the number of books per author.
+    """
+    permission_classes = [AllowAny]
+
+    def is_count_only(self):
+        return self.request.query_params.get('books') == 'count'
+
+    def get_queryset(self):
+        queryset = Author.objects.order_by('name')
+
+        if self.is_count_only():
+            # Sparse mode: a single aggregate query, no book rows fetched
+            return queryset.annotate(book_count=Count('books'))
+
+        # One prefetch query for every author's books, newest first and capped per author
+        books = Book.objects.order_by('-publication_year', 'title')[:MAX_BOOKS_PER_AUTHOR]
+        # Stored apart, so that author.books still means all of them
+        return queryset.prefetch_related(Prefetch('books', queryset=books, to_attr='latest_books'))
+
+    def get_serializer_class(self):
+        if self.is_count_only():
+            return AuthorBookCountSerializer
+        return AuthorSerializer
+
+
+class AuthorListView(AuthorQuerysetMixin, generics.ListAPIView):
+    pass
+
+
+class AuthorDetailView(AuthorQuerysetMixin, generics.RetrieveAPIView):
+    pass
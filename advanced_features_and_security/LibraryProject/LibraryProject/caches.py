@@ -0,0 +1,29 @@
+"""
+Cache timeouts that stay correct with several worker processes.
+
+The cached pages, fragments, roles, permissions and admin filters are
+invalidated from model signals, by the process making the change. Only a
+cache shared by the processes (CACHE_URL, see settings.py) carries the
+invalidation to the others: with a per-process cache such as the default
+LocMemCache, they would go on serving a stale entry until it expires.
+cache_timeout() caps the timeouts to LOCAL_CACHE_TIMEOUT seconds there.
+"""
+from django.conf import settings
+
+LOCAL_CACHE_TIMEOUT = 5
+
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_shared_cache(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def cache_timeout(timeout, alias='default'):
+    """`timeout`, capped to LOCAL_CACHE_TIMEOUT unless the cache is shared."""
+    if is_shared_cache(alias):
+        return timeout
+    return LOCAL_CACHE_TIMEOUT if timeout is None else min(timeout, LOCAL_CACHE_TIMEOUT)
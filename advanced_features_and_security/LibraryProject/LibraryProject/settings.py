@@ -15,12 +15,19 @@ For production deployment, ensure:
 import os
 from pathlib import Path
 
+from LibraryProject.sqlite import parse_pragmas, sqlite_options
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Point to custom User model
 AUTH_USER_MODEL = 'bookshelf.CustomUser'
 
+# ModelBackend with user permissions cached across requests
+AUTHENTICATION_BACKENDS = [
+    'bookshelf.backends.CachedPermissionBackend',
+]
+
 
 # =====================================================
 # CORE SECURITY SETTINGS
@@ -80,6 +87,9 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
 
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+
+    # RoleMiddleware: sets request.role from the cached UserProfile role
+    'relationship_app.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
 
     # XFrameOptionsMiddleware: Protects against clickjacking attacks
@@ -95,8 +105,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parsed templates are kept in memory (also with DEBUG = True;
+            # edited templates are picked up by the autoreloader)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -112,14 +129,34 @@ WSGI_APPLICATION = 'LibraryProject.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+# SQLite tuned for concurrent requests (see LibraryProject/sqlite.py), pragmas can be
+# changed with e.g. SQLITE_PRAGMAS=synchronous=FULL,mmap_size=0
+SQLITE_PRAGMAS = parse_pragmas(os.getenv('SQLITE_PRAGMAS', ''))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': sqlite_options(**SQLITE_PRAGMAS),
     }
 }
 
 
+# Cache shared by the worker processes, e.g. CACHE_URL=redis://127.0.0.1:6379/0
+# (needs redis-py). Without it each process has its own cache, and the cached pages, roles and permissions are
+# kept a few seconds only (see LibraryProject/caches.py)
+CACHE_URL = os.getenv('CACHE_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
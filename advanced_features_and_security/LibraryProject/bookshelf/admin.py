@@ -3,18 +3,20 @@ from .models import Book
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser
+from .search import search_users
+from .changelist import CachedAllValuesFieldListFilter, ChangelistPerformanceMixin
 
 
 # Register your models here.
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(ChangelistPerformanceMixin, admin.ModelAdmin):
     list_display = ('title', 'author', 'publication_year')
     search_fields = ('title', 'author')
-    list_filter = ('publication_year',)
+    list_filter = (('publication_year', CachedAllValuesFieldListFilter),)
 
 admin.site.register(Book, BookAdmin)
 
 # Register your models here.
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(ChangelistPerformanceMixin, UserAdmin):
     """
     custom admin interface for the user model.
     """
@@ -26,8 +28,8 @@ class CustomUserAdmin(UserAdmin):
     # fields to filter by in the sidebar
     list_filter = ['is_staff', 'is_superuser', 'is_active', 'date_joined']
 
-    # fileds to search
-    search_fields = ['username', 'email', 'date_of_birth']
+    # fileds to search (by prefix, case-insensitive, see get_search_results)
+    search_fields = ['username', 'email', 'first_name', 'last_name']
 
     # ordering
     ordering = ['username']
@@ -46,5 +48,9 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed prefix search instead of an icontains scan per search field
+        return search_users(queryset, search_term), False
+
 
 admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class BookshelfConfig(AppConfig):
     name = 'bookshelf'
+
+    def ready(self):
+        # Keeps the cached permissions of CachedPermissionBackend up to date
+        from .backends import connect_signals
+        connect_signals()
+        # Registers the signal handlers that drop cached pages
+        from . import caching  # noqa: F401
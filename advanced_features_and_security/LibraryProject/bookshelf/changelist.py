@@ -0,0 +1,239 @@
+"""
+Admin changelist tuned for large tables.
+
+ChangelistPerformanceMixin makes a ModelAdmin changelist cost about the same
+at ten million rows as at ten thousand:
+
+- counts are exact up to COUNT_LIMIT rows and estimated beyond (from the
+  planner statistics on PostgreSQL), and the unfiltered total is not counted
+- pages are navigated with a keyset (?_after=<pk of the last row>, and
+  ?_before=<pk of the first row> back) instead of OFFSET, whenever the
+  changelist ordering allows it
+- the distinct values listed by CachedAllValuesFieldListFilter are cached
+  until the model is saved or deleted, and facet counts are disabled
+- list_select_related defaults to the relations shown in list_display
+"""
+from django.contrib import admin
+from django.contrib.admin.filters import AllValuesFieldListFilter
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import reverse_field_path
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.signals import post_delete, post_save
+from django.utils.functional import cached_property
+
+from LibraryProject.caches import cache_timeout
+
+COUNT_LIMIT = 10000
+FACET_CACHE_TIMEOUT = 60 * 60
+KEYSET_VAR = '_after'
+KEYSET_BEFORE_VAR = '_before'
+
+
+def estimate_count(queryset):
+    """
+    Returns (count, exact). Counting stops after COUNT_LIMIT rows; past that
+    an unfiltered PostgreSQL table uses its row estimate.
+    """
+    count = queryset.order_by()[:COUNT_LIMIT + 1].count()
+    if count <= COUNT_LIMIT:
+        return count, True
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > COUNT_LIMIT:
+            return row[0], False
+    return COUNT_LIMIT, False
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        count, self.count_is_exact = estimate_count(self.object_list)
+        return count
+
+
+def facet_version_key(model):
+    return f'bookshelf:facets:{model._meta.label_lower}'
+
+
+def bump_facet_version(sender, **kwargs):
+    try:
+        cache.incr(facet_version_key(sender))
+    except ValueError:
+        cache.set(facet_version_key(sender), 1, None)
+
+
+def watch_model(model):
+    """Drops the cached filter values of `model` whenever a row changes."""
+    uid = f'bookshelf.changelist.{model._meta.label_lower}'
+    post_save.connect(bump_facet_version, sender=model, dispatch_uid=uid)
+    post_delete.connect(bump_facet_version, sender=model, dispatch_uid=uid)
+
+
+class CachedAllValuesFieldListFilter(AllValuesFieldListFilter):
+    """AllValuesFieldListFilter without a SELECT DISTINCT on every page load."""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        parent_model = reverse_field_path(model, field_path)[0]
+        watch_model(parent_model)
+
+        version = cache.get(facet_version_key(parent_model), 0)
+        key = f'{facet_version_key(parent_model)}:{version}:{field_path}'
+        choices = cache.get(key)
+        if choices is None:
+            choices = list(self.lookup_choices)
+            cache.set(key, choices, cache_timeout(FACET_CACHE_TIMEOUT))
+        self.lookup_choices = choices
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList paginated by keyset when the ordering is on plain columns."""
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(KEYSET_VAR, None)
+        lookup_params.pop(KEYSET_BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Sorting, filtering and searching start again from the first page
+        new_params = new_params or {}
+        remove = [*(remove or []), *(var for var in (KEYSET_VAR, KEYSET_BEFORE_VAR) if var not in new_params)]
+        return super().get_query_string(new_params, remove)
+
+    def get_keyset_fields(self):
+        """
+        Returns [(field name, descending)] for the queryset ordering, or None
+        if it cannot be used as a keyset (expressions, relations, nulls).
+        """
+        fields = []
+        for item in self.queryset.query.order_by:
+            if not isinstance(item, str) or LOOKUP_SEP in item:
+                return None
+            name = item.lstrip('-')
+            try:
+                field = self.lookup_opts.pk if name == 'pk' else self.lookup_opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.is_relation or field.null:
+                return None
+            fields.append((name, item.startswith('-')))
+        return fields or None
+
+    def get_keyset_filter(self, fields, pk, before=False):
+        """The rows after the row `pk` in the ordering of `fields`, or before it."""
+        try:
+            values = self.model._default_manager.filter(pk=pk).values(
+                *[name for name, _ in fields]).first()
+        except (ValueError, ValidationError):
+            values = None
+        if values is None:
+            raise IncorrectLookupParameters
+
+        # (a, b) > (x, y) written as a > x OR (a = x AND b > y)
+        condition = Q()
+        for position, (name, descending) in enumerate(fields):
+            lookup = 'lt' if descending != before else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[name]})
+            for previous, _ in fields[:position]:
+                term &= Q(**{previous: values[previous]})
+            condition |= term
+        return condition
+
+    def get_results(self, request):
+        fields = self.get_keyset_fields()
+        if fields is None or self.show_all or self.page_num > 1:
+            self.keyset_pagination = False
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        result_count = paginator.count
+
+        after = request.GET.get(KEYSET_VAR)
+        before = request.GET.get(KEYSET_BEFORE_VAR)
+        # One extra row tells whether there is a page beyond
+        if before and not after:
+            # Read backwards from the row, then put back in order
+            page = list(self.queryset.filter(self.get_keyset_filter(fields, before, before=True))
+                        .reverse()[:self.list_per_page + 1])
+            more_before, more_after = len(page) > self.list_per_page, True
+            result_list = page[:self.list_per_page][::-1]
+        else:
+            queryset = self.queryset
+            if after:
+                queryset = queryset.filter(self.get_keyset_filter(fields, after))
+            page = list(queryset[:self.list_per_page + 1])
+            more_before, more_after = bool(after), len(page) > self.list_per_page
+            result_list = page[:self.list_per_page]
+
+        self.next_page_url = self.previous_page_url = None
+        if result_list and more_after:
+            self.next_page_url = self.get_query_string({KEYSET_VAR: result_list[-1].pk})
+        if result_list and more_before:
+            self.previous_page_url = self.get_query_string({KEYSET_BEFORE_VAR: result_list[0].pk})
+        self.first_page_url = self.get_query_string() if more_before else None
+
+        self.keyset_pagination = True
+        self.result_count = result_count
+        self.result_count_is_exact = getattr(paginator, 'count_is_exact', True)
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = bool(more_before or self.next_page_url)
+        self.paginator = paginator
+
+
+class ChangelistPerformanceMixin:
+    """ModelAdmin mixin, see the module docstring."""
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    paginator = EstimatedCountPaginator
+    change_list_template = 'admin/bookshelf/performance_change_list.html'
+
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        watch_model(model)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_list_select_related(self, request):
+        if self.list_select_related is not False:
+            return self.list_select_related
+
+        # Only the forward relations list_display goes through, rather than
+        # the select_related() of every non-null foreign key
+        related = []
+        for name in self.get_list_display(request):
+            if not isinstance(name, str):
+                continue
+            opts = self.model._meta
+            path = []
+            for attr in name.split(LOOKUP_SEP):
+                try:
+                    field = opts.get_field(attr)
+                except FieldDoesNotExist:
+                    break
+                if not (field.many_to_one or field.one_to_one) or not field.concrete:
+                    break
+                path.append(attr)
+                opts = field.related_model._meta
+            if path and name != self.model._meta.get_field(path[0]).attname:
+                related.append(LOOKUP_SEP.join(path))
+        return related
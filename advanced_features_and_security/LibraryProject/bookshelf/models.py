@@ -1,12 +1,15 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import BaseUserManager
 from django.db import models
+from django.db.models.functions import Lower
 
 # Create your models here.
 class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.CharField(max_length=100)
     publication_year = models.IntegerField()
+    # Part of the template fragment cache keys of the book
+    updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -63,6 +66,13 @@ class CustomUser(AbstractUser):
             ('can_edit', 'Can edit item'),
             ('can_delete', 'Can delete item')
         ]
+        # Case-insensitive prefix search, see bookshelf.search
+        indexes = [
+            models.Index(Lower('username'), name='bookshelf_user_username_ci'),
+            models.Index(Lower('email'), name='bookshelf_user_email_ci'),
+            models.Index(Lower('first_name'), name='bookshelf_user_first_name_ci'),
+            models.Index(Lower('last_name'), name='bookshelf_user_last_name_ci'),
+        ]
 
     def __str__(self):
         return self.username
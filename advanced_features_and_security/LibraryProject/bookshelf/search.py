@@ -0,0 +1,99 @@
+"""
+Case-insensitive user search.
+
+Usernames, emails and names are matched by prefix against their lowercased
+values. CustomUser.Meta.indexes has an expression index on each LOWER(...),
+and the prefix is written as a range on that expression, so SQLite, MySQL 8
+and PostgreSQL read the index instead of scanning the table with LIKE.
+"jane do" also matches first name "Jane" with last name "Doe...".
+
+On PostgreSQL with django.contrib.postgres installed, queries of at least
+TRIGRAM_MIN_LENGTH characters also match similar usernames and emails
+(pg_trgm, e.g. "jhon" finds "john"). Serve them from a GIN index with
+gin_trgm_ops on LOWER(username) and LOWER(email).
+"""
+from django.apps import apps
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+TRIGRAM_FIELDS = ('username', 'email')
+TRIGRAM_MIN_LENGTH = 3
+
+MAX_QUERY_LENGTH = 100
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+# Sorts after any string starting with the prefix
+MAX_CHAR = '\U0010ffff'
+
+
+def normalize_query(query):
+    """Lowercases the query and collapses whitespace."""
+    return ' '.join(query[:MAX_QUERY_LENGTH].lower().split())
+
+
+def lower_name(field):
+    return f'{field}_lower'
+
+
+def with_lower_fields(queryset, fields=SEARCH_FIELDS):
+    # alias() rather than annotate(): the expressions are filtered on, not selected
+    return queryset.alias(**{lower_name(field): Lower(field) for field in fields})
+
+
+def prefix_q(field, prefix):
+    """
+    `field` starts with `prefix` (both lowercase). The range can use the
+    LOWER(field) index; startswith makes the match exact under any collation.
+    """
+    name = lower_name(field)
+    return Q(**{
+        f'{name}__gte': prefix,
+        f'{name}__lt': prefix + MAX_CHAR,
+        f'{name}__startswith': prefix,
+    })
+
+
+def use_trigrams(queryset, query):
+    return (
+        len(query) >= TRIGRAM_MIN_LENGTH
+        and connections[queryset.db].vendor == 'postgresql'
+        and apps.is_installed('django.contrib.postgres')
+    )
+
+
+def search_users(queryset, query):
+    """Filters `queryset` (of users) by a free text search query."""
+    query = normalize_query(query)
+    if not query:
+        return queryset
+
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= prefix_q(field, query)
+
+    first, _, last = query.partition(' ')
+    if last:
+        condition |= prefix_q('first_name', first) & prefix_q('last_name', last)
+
+    if use_trigrams(queryset, query):
+        for field in TRIGRAM_FIELDS:
+            condition |= Q(**{f'{lower_name(field)}__trigram_similar': query})
+
+    return with_lower_fields(queryset).filter(condition)
+
+
+def autocomplete_users(queryset, prefix, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Returns at most `limit` (id, username) pairs for usernames starting with
+    `prefix`, in index order.
+    """
+    prefix = normalize_query(prefix)
+    if not prefix:
+        return []
+    limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+
+    queryset = with_lower_fields(queryset, ('username',)).filter(prefix_q('username', prefix))
+    return list(queryset.order_by(lower_name('username')).values_list('id', 'username')[:limit])
@@ -1,3 +1,286 @@
-from django.test import TestCase
+import datetime
+import html
+import json
+import re
+from unittest import mock, skipUnless
+from urllib.parse import unquote
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from .models import Book
+from .search import AUTOCOMPLETE_MAX_LIMIT, autocomplete_users, search_users
+from .views import list_users, user_autocomplete
+
+User = get_user_model()
+
+
+class KeysetChangeListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password123',
+                                                   date_of_birth=datetime.date(2000, 1, 1))
+        self.client.force_login(self.admin)
+        # Two books per title: the pk breaks the ties
+        self.books = [
+            Book.objects.create(title=title, author='Author', publication_year=2000)
+            for title in ('Dune', 'Emma', 'Dune', 'Beloved', 'Emma', 'Beloved')
+        ]
+        # ?o=1 sorts by title, then the changelist adds -pk
+        self.ordered = sorted(self.books, key=lambda book: (book.title, -book.pk))
+        patcher = mock.patch.object(admin.site._registry[Book], 'list_per_page', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, query='?o=1'):
+        return self.client.get(reverse('admin:bookshelf_book_changelist') + query, secure=True)
+
+    def test_next_and_previous_pages(self):
+        changelist = self.get().context['cl']
+        self.assertTrue(changelist.keyset_pagination)
+        self.assertEqual(list(changelist.result_list), self.ordered[:2])
+        self.assertIsNone(changelist.previous_page_url)
+
+        changelist = self.get(changelist.next_page_url).context['cl']
+        self.assertEqual(list(changelist.result_list), self.ordered[2:4])
+
+        changelist = self.get(changelist.next_page_url).context['cl']
+        self.assertEqual(list(changelist.result_list), self.ordered[4:])
+        self.assertIsNone(changelist.next_page_url)
+
+        changelist = self.get(changelist.previous_page_url).context['cl']
+        self.assertEqual(list(changelist.result_list), self.ordered[2:4])
+
+        changelist = self.get(changelist.previous_page_url).context['cl']
+        self.assertEqual(list(changelist.result_list), self.ordered[:2])
+        self.assertIsNone(changelist.previous_page_url)
+        self.assertIn(f'_after={self.ordered[1].pk}', changelist.next_page_url)
+
+    def test_ties_are_neither_skipped_nor_repeated(self):
+        seen = []
+        query = '?o=1'
+        while query:
+            changelist = self.get(query).context['cl']
+            seen += changelist.result_list
+            query = changelist.next_page_url
+
+        self.assertEqual(seen, self.ordered)
+
+    def test_tampered_cursor(self):
+        for query in ('?o=1&_after=999', '?o=1&_after=abc', '?o=1&_before=999'):
+            with self.subTest(query=query):
+                response = self.get(query)
+                # IncorrectLookupParameters: back to the changelist with ?e=1
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response['Location'].endswith('?e=1'))
+
+
+class CachedPermissionBackendTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'password123',
+                                             date_of_birth=datetime.date(2000, 1, 1))
+        self.permission = Permission.objects.get(codename='can_edit')
+        self.group = Group.objects.create(name='Editors')
+        self.group.permissions.add(self.permission)
+        self.user.groups.add(self.group)
+
+    def assertPermissionsCached(self):
+        # The user's own and group permissions are loaded once, then cached.
+        # Only the queries are checked: relationship_app.User's reverse
+        # relations clash with CustomUser's, which ModelBackend's lookups hit
+        for queries in (2, 0):
+            # A fresh user object, as in each request
+            user = User.objects.get(pk=self.user.pk)
+            with self.assertNumQueries(queries):
+                user.has_perm('bookshelf.can_edit')
+
+    def test_permissions_are_cached(self):
+        self.assertPermissionsCached()
+
+    def test_group_membership_change_drops_cached_permissions(self):
+        self.assertPermissionsCached()
+
+        self.user.groups.remove(self.group)
+
+        self.assertPermissionsCached()
+
+    def test_group_permission_change_drops_cached_permissions(self):
+        self.assertPermissionsCached()
+
+        self.group.permissions.remove(self.permission)
+
+        self.assertPermissionsCached()
+
+    def test_user_permission_change_drops_cached_permissions(self):
+        self.user.groups.clear()
+        self.assertPermissionsCached()
+
+        self.user.user_permissions.add(self.permission)
+
+        self.assertPermissionsCached()
+
+    def test_deleted_group_drops_cached_permissions(self):
+        self.assertPermissionsCached()
+
+        self.group.delete()
+
+        self.assertPermissionsCached()
+
+
+class UserSearchTests(TestCase):
+
+    def setUp(self):
+        for username, email, first_name, last_name in [
+            ('JaneDoe', 'jane@example.com', 'Jane', 'Doe'),
+            ('janet', 'janet@example.org', 'Janet', 'Smith'),
+            ('bob', 'Bob.Jansen@example.com', 'Bob', 'Jansen'),
+            ('alice', 'alice@example.com', 'Alice', 'Mejane'),
+        ]:
+            User.objects.create_user(username, email, 'password123', first_name=first_name, last_name=last_name,
+                                     date_of_birth=datetime.date(2000, 1, 1))
+
+    def search(self, query):
+        return sorted(search_users(User.objects.all(), query).values_list('username', flat=True))
+
+    def test_prefix_of_any_field(self):
+        self.assertEqual(self.search('jan'), ['JaneDoe', 'bob', 'janet'])
+        self.assertEqual(self.search('smi'), ['janet'])
+        self.assertEqual(self.search('janet@'), ['janet'])
+
+    def test_case_insensitive(self):
+        self.assertEqual(self.search('JANEDOE'), ['JaneDoe'])
+        self.assertEqual(self.search('  Bob.JANSEN@  '), ['bob'])
+
+    def test_only_prefixes_match(self):
+        self.assertEqual(self.search('ane'), [])
+        self.assertEqual(self.search('example'), [])
+
+    def test_first_and_last_name(self):
+        self.assertEqual(self.search('jane do'), ['JaneDoe'])
+        self.assertEqual(self.search('jane sm'), ['janet'])
+        self.assertEqual(self.search('jane x'), [])
+
+    def test_empty_query_matches_everyone(self):
+        self.assertEqual(len(self.search('   ')), 4)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_search_reads_the_lowercase_indexes(self):
+        plan = search_users(User.objects.all(), 'jan').explain()
+
+        for field in ('username', 'email', 'first_name', 'last_name'):
+            self.assertIn(f'USING INDEX bookshelf_user_{field}_ci', plan)
+
+    def test_autocomplete(self):
+        users = autocomplete_users(User.objects.all(), 'JAN')
+
+        self.assertEqual([username for _, username in users], ['JaneDoe', 'janet'])
+        self.assertEqual(autocomplete_users(User.objects.all(), ''), [])
+
+    def test_autocomplete_limit(self):
+        for i in range(AUTOCOMPLETE_MAX_LIMIT + 5):
+            User.objects.create_user(f'reader{i:02d}', f'reader{i}@example.com', 'password123',
+                                     date_of_birth=datetime.date(2000, 1, 1))
+
+        self.assertEqual(len(autocomplete_users(User.objects.all(), 'reader', limit=3)), 3)
+        self.assertEqual(len(autocomplete_users(User.objects.all(), 'reader', limit=1000)), AUTOCOMPLETE_MAX_LIMIT)
+        self.assertEqual(len(autocomplete_users(User.objects.all(), 'reader', limit=0)), 1)
+
+    def test_autocomplete_view(self):
+        request = RequestFactory().get('/users/autocomplete/', {'q': 'Jan', 'limit': '1'})
+        request.user = User.objects.create_superuser('admin', 'admin@example.com', 'password123',
+                                                     date_of_birth=datetime.date(2000, 1, 1))
+
+        response = user_autocomplete(request)
+
+        janedoe = User.objects.get(username='JaneDoe')
+        self.assertEqual(json.loads(response.content), {'results': [{'id': janedoe.pk, 'username': 'JaneDoe'}]})
+
+
+@mock.patch('bookshelf.views.USERS_PER_PAGE', 2)
+class UserListTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password123',
+                                                   date_of_birth=datetime.date(2000, 1, 1))
+        for username in ('eve', 'bob', '<script>alert(1)</script>', 'amy', 'dan'):
+            User.objects.create_user(username, f'{username[:3]}"@example.com', 'password123',
+                                     date_of_birth=datetime.date(2000, 1, 1))
+        self.usernames = sorted(User.objects.values_list('username', flat=True))
+
+    def get(self, **params):
+        request = RequestFactory().get('/users/', params)
+        request.user = self.admin
+        response = list_users(request)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def page(self, **params):
+        """The usernames listed, and the cursor of the next page."""
+        content = self.get(**params).content.decode()
+        usernames = [html.unescape(username) for username in re.findall(r'<li>(.*?) - ', content)]
+        after = re.search(r'after=([^"]+)">Next page', content)
+        return usernames, after and unquote(after.group(1))
+
+    def test_pages_follow_each_other(self):
+        seen = []
+        usernames, after = self.page()
+        seen += usernames
+        while after:
+            self.assertEqual(len(usernames), 2)
+            usernames, after = self.page(after=after)
+            seen += usernames
+
+        self.assertEqual(seen, self.usernames)
+
+    def test_page_starts_after_the_cursor(self):
+        self.assertEqual(self.page(after='amy'), (['bob', 'dan'], 'dan'))
+        # Not a username: the next ones still follow
+        self.assertEqual(self.page(after='c'), (['dan', 'eve'], None))
+
+    def test_missing_or_bad_cursor(self):
+        first = self.page()
+        self.assertEqual(first[0], ['<script>alert(1)</script>', 'admin'])
+        self.assertEqual(self.page(after=''), first)
+        self.assertEqual(self.page(after='zzz'), ([], None))
+        self.assertEqual(self.page(after="' OR 1=1 --" + 'x' * 500), first)
+        self.assertContains(self.get(after='zzz'), 'No users found.')
+
+    def test_page_is_escaped(self):
+        response = self.get(search='<')
+
+        self.assertContains(response, '<li>&lt;script&gt;alert(1)&lt;/script&gt; - &lt;sc&quot;@example.com</li>')
+        self.assertContains(response, 'Search results for: &lt;')
+        self.assertNotContains(response, '<script>')
+
+    def test_search_with_cursor(self):
+        self.assertEqual(self.page(search='A'), (['admin', 'amy'], None))
+        self.assertEqual(self.page(search='a', after='admin'), (['amy'], None))
+
+    def test_stream_is_escaped(self):
+        with mock.patch('bookshelf.views.STREAM_CHUNK_SIZE', 2):
+            response = self.get(stream='1', search='<')
+
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('<p>Search results for: &lt;</p>', content)
+        self.assertIn('<li>&lt;script&gt;alert(1)&lt;/script&gt; - &lt;sc&quot;@example.com</li>', content)
+        self.assertNotIn('<script>', content)
+
+    def test_stream_lists_every_user_in_chunks(self):
+        with mock.patch('bookshelf.views.STREAM_CHUNK_SIZE', 2):
+            response = self.get(stream='1')
+            chunks = list(response.streaming_content)
+
+        content = b''.join(chunks).decode()
+        self.assertEqual(len(re.findall('<li>', content)), len(self.usernames))
+        self.assertTrue(content.endswith('</ul>'))
+        # Header, opening tag, three full chunks and the rest
+        self.assertEqual(len(chunks), 6)
 
-# Create your tests here.
@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('users/', views.list_users, name='list_users'),
+    path('users/autocomplete/', views.user_autocomplete, name='user_autocomplete'),
     path('users/create/', views.create_user, name='create_user'),
     path('users/edit/<int:user_id>/', views.edit_user, name='edit_user'),
     path('users/delete/<int:user_id>/', views.delete_user, name='delete_user'),
@@ -6,65 +6,102 @@ All views implement protection against SQL injection, XSS, and CSRF attacks.
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
-from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_protect
-from django.utils.html import escape
+from django.utils.html import escape, format_html
 import logging
 
+from .search import AUTOCOMPLETE_LIMIT, autocomplete_users, search_users
+
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+USERS_PER_PAGE = 50
+STREAM_CHUNK_SIZE = 500
+
 
 @login_required
 @permission_required('bookshelf.can_view', raise_exception=True)
 @csrf_protect  # Explicitly enforce CSRF protection
 def list_users(request):
     """
-    View to list all users with search functionality.
+    View to list users with search functionality.
     Requires: can_view permission
 
+    Users are listed by username, USERS_PER_PAGE at a time. The next page
+    starts after the last username of the current one (?after=<username>),
+    so deep pages cost the same as the first. ?stream=1 streams the whole
+    list in chunks instead of rendering a page.
+
     Security measures:
     - Uses Django ORM (prevents SQL injection)
     - Validates and sanitizes search input
     - Escapes output to prevent XSS
     """
     # Get search query parameter
-    search_query = request.GET.get('search', '')
+    search_query = request.GET.get('search', '')[:100].strip()
+    after = request.GET.get('after', '')[:150]
 
-    # Use Django ORM with Q objects for safe querying
-    # This prevents SQL injection by using parameterized queries
+    # SECURE: Django ORM automatically escapes and parameterizes queries
+    users = User.objects.order_by('username').values_list('username', 'email')
     if search_query:
-        # Sanitize input by limiting length and stripping dangerous characters
-        search_query = search_query[:100].strip()
-
-        # Use Django ORM - NOT raw SQL
-        # SECURE: Django ORM automatically escapes and parameterizes queries
-        users = User.objects.filter(
-            Q(username__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query)
-        )
-    else:
-        users = User.objects.all()
+        # Indexed, case-insensitive prefix search (see bookshelf.search)
+        users = search_users(users, search_query)
 
     # Log the action for security auditing
     logger.info(f"User {request.user.username} viewed user list")
 
-    # Escape output to prevent XSS (though Django templates auto-escape)
-    users_list = "<h1>Users List</h1>"
+    if request.GET.get('stream'):
+        return StreamingHttpResponse(stream_users(users, search_query))
+
+    if after:
+        users = users.filter(username__gt=after)
+    # One extra row tells whether there is a next page
+    users = list(users[:USERS_PER_PAGE + 1])
+    next_after = users[USERS_PER_PAGE - 1][0] if len(users) > USERS_PER_PAGE else None
+
+    # Templates auto-escape the usernames, emails and the search query
+    return render(request, 'bookshelf/user_list.html', {
+        'users': users[:USERS_PER_PAGE],
+        'search_query': search_query,
+        'next_after': next_after,
+    })
+
+
+def stream_users(users, search_query):
+    """Yields the user list as HTML, one chunk of users at a time."""
+    yield "<h1>Users List</h1>"
     if search_query:
-        # Escape the search query before displaying
-        users_list += f"<p>Search results for: {escape(search_query)}</p>"
+        yield format_html("<p>Search results for: {}</p>", search_query)
+
+    yield "<ul>"
+    chunk = []
+    for username, email in users.iterator(chunk_size=STREAM_CHUNK_SIZE):
+        # format_html escapes its arguments
+        chunk.append(format_html("<li>{} - {}</li>", username, email))
+        if len(chunk) == STREAM_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    yield "".join(chunk) + "</ul>"
 
-    users_list += "<ul>"
-    for user in users:
-        # Django auto-escapes, but being explicit for clarity
-        users_list += f"<li>{escape(user.username)} - {escape(user.email)}</li>"
-    users_list += "</ul>"
 
-    return HttpResponse(users_list)
+@login_required
+@permission_required('bookshelf.can_view', raise_exception=True)
+def user_autocomplete(request):
+    """
+    JSON list of the users whose username starts with ?q=, for search boxes.
+    Returns at most ?limit= (capped at AUTOCOMPLETE_MAX_LIMIT) results.
+    Requires: can_view permission
+    """
+    try:
+        limit = int(request.GET.get('limit', AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+
+    users = autocomplete_users(User.objects.all(), request.GET.get('q', ''), limit)
+    return JsonResponse({
+        'results': [{'id': pk, 'username': username} for pk, username in users],
+    })
 
 
 @login_required
@@ -277,6 +314,9 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_protect
 from django.contrib import messages
 from django.db.models import Q
+from LibraryProject.book_listing import render_book_list
+from LibraryProject.page_cache import cache_anonymous_page
+from .caching import BOOK_ROW_CACHE_TIMEOUT, PAGE_NAMESPACE
 from .forms import ExampleForm, SearchForm
 from .models import Book
 
@@ -317,6 +357,7 @@ def form_example_view(request):
     return render(request, 'bookshelf/form_example.html', {'form': form})
 
 
+@cache_anonymous_page(PAGE_NAMESPACE)
 @csrf_protect
 def book_list_view(request):
     """
@@ -343,11 +384,12 @@ def book_list_view(request):
             )
 
     context = {
-        'books': books,
         'form': form,
+        'book_row_cache_timeout': BOOK_ROW_CACHE_TIMEOUT,
     }
 
-    return render(request, 'bookshelf/book_list.html', context)
+    # Keyset paginated, see LibraryProject.book_listing
+    return render_book_list(request, 'bookshelf/book_list.html', 'bookshelf/book_rows.html', books, context)
 
 
 # Example of INSECURE code (DO NOT USE):
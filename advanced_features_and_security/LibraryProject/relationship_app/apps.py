@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RelationshipAppConfig(AppConfig):
     name = 'relationship_app'
+
+    def ready(self):
+        # Registers the signal handlers that keep cached roles and pages up to date
+        from . import caching, roles  # noqa: F401
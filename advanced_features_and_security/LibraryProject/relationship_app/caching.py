@@ -0,0 +1,71 @@
+"""
+Caching for the library pages.
+
+- Whole pages are cached for anonymous visitors (LibraryProject.page_cache,
+  namespace PAGE_NAMESPACE), and dropped on any book, author or library change.
+- The book list of library_detail.html is cached per library (the
+  'library_books' fragment, keyed by library id). The fragments of the
+  affected libraries are deleted when books are added to or removed from a
+  library, and when a book or its author is saved or deleted.
+- Each book row is cached per book id and Book.updated stamp ('book_row' and
+  'library_book_row' fragments), so an edited book gets a new key. Renaming
+  an author touches the stamp of their books.
+"""
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from LibraryProject.page_cache import invalidate_pages
+
+from .models import Author, Book, Library
+
+LIBRARY_CACHE_TIMEOUT = 60 * 60
+BOOK_ROW_CACHE_TIMEOUT = 60 * 60 * 24
+PAGE_NAMESPACE = 'relationship_app'
+
+
+def invalidate_library_books(library_ids):
+    cache.delete_many([make_template_fragment_key('library_books', [pk]) for pk in library_ids])
+
+
+@receiver(m2m_changed, sender=Library.books.through)
+def library_books_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_pages(PAGE_NAMESPACE)
+
+    if not reverse:
+        # library.books.add/remove/clear(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_library_books([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # book.library_set.add/remove(...)
+        invalidate_library_books(pk_set)
+    elif action == 'pre_clear':
+        # The libraries are unknown once cleared
+        invalidate_library_books(instance.library_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Book)
+@receiver(pre_delete, sender=Book)
+def book_changed(sender, instance, **kwargs):
+    # pre_delete: the library links are deleted along with the book
+    invalidate_library_books(Library.objects.filter(books=instance).values_list('pk', flat=True))
+    invalidate_pages(PAGE_NAMESPACE)
+
+
+@receiver(post_save, sender=Author)
+def author_changed(sender, instance, created, **kwargs):
+    if not created:
+        # The book rows show the author's name
+        Book.objects.filter(author=instance).update(updated=timezone.now())
+        invalidate_library_books(
+            Library.objects.filter(books__author=instance).values_list('pk', flat=True).distinct())
+        invalidate_pages(PAGE_NAMESPACE)
+
+
+@receiver(post_save, sender=Library)
+@receiver(post_delete, sender=Library)
+def library_changed(sender, instance, **kwargs):
+    invalidate_pages(PAGE_NAMESPACE)
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .middleware import RoleMiddleware
+from .models import Author, Book, Library, User, UserProfile, bulk_profile_creation, get_profile
+from .roles import get_user_role
+from .views import LibraryDetailView, librarian_view
+
+
+class RoleCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('librarian', 'librarian@example.com', 'password123',
+                                             date_of_birth=datetime.date(2000, 1, 1))
+        UserProfile.objects.filter(user=self.user).update(role='Librarian')
+        cache.clear()
+
+    def role(self, queries):
+        # A fresh user object, as in each request
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(queries):
+            return get_user_role(user)
+
+    def test_role_is_read_once(self):
+        self.assertEqual(self.role(1), 'Librarian')
+        self.assertEqual(self.role(0), 'Librarian')
+
+    def test_role_is_kept_on_the_user(self):
+        user = User.objects.get(pk=self.user.pk)
+        get_user_role(user)
+        cache.clear()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_role(user), 'Librarian')
+
+    def test_changed_role_updates_the_cache(self):
+        self.assertEqual(self.role(1), 'Librarian')
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'Admin'
+        profile.save()
+
+        self.assertEqual(self.role(0), 'Admin')
+
+    def test_deleted_profile_drops_the_role(self):
+        self.assertEqual(self.role(1), 'Librarian')
+
+        UserProfile.objects.get(user=self.user).delete()
+
+        self.assertIsNone(self.role(1))
+        # No profile is cached too
+        self.assertIsNone(self.role(0))
+
+    def test_anonymous_users_have_no_role(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_user_role(AnonymousUser()))
+
+    def test_middleware_looks_the_role_up_lazily(self):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=self.user.pk)
+        middleware = RoleMiddleware(lambda request: HttpResponse())
+
+        with self.assertNumQueries(0):
+            middleware(request)
+        with self.assertNumQueries(1):
+            self.assertEqual(request.role, 'Librarian')
+
+    def test_role_gated_view(self):
+        request = RequestFactory().get('/librarian_view/')
+        request.user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(librarian_view(request).status_code, 200)
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'Member'
+        profile.save()
+
+        request.user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(librarian_view(request).status_code, 302)
+
+
+class UserProfileTests(TestCase):
+
+    def create_user(self, username):
+        return User.objects.create_user(username, f'{username}@example.com', 'password123',
+                                        date_of_birth=datetime.date(2000, 1, 1))
+
+    def setUp(self):
+        self.user = self.create_user('reader')
+        self.profile = UserProfile.objects.get(user=self.user)
+
+    def test_profile_is_created_with_the_user(self):
+        self.assertEqual(self.profile.role, '')
+
+    def test_only_changed_fields_are_written(self):
+        self.profile.role = 'Member'
+
+        with mock.patch('django.db.models.Model.save', autospec=True) as save:
+            self.profile.save()
+
+        self.assertEqual(save.call_args.kwargs['update_fields'], ['role'])
+
+    def test_update_writes_the_changed_column(self):
+        self.profile.role = 'Member'
+
+        with CaptureQueriesContext(connection) as queries:
+            self.profile.save()
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('SET "role"', queries[0]['sql'])
+        self.assertNotIn('"user_id"', queries[0]['sql'].split('WHERE')[0])
+        self.assertEqual(UserProfile.objects.get(pk=self.profile.pk).role, 'Member')
+
+    def test_unchanged_profile_is_not_written(self):
+        with self.assertNumQueries(0):
+            self.profile.save()
+
+        self.profile.role = 'Admin'
+        self.profile.save()
+        with self.assertNumQueries(0):
+            self.profile.save()
+
+    def test_explicit_update_fields_are_kept(self):
+        self.profile.role = 'Member'
+
+        with mock.patch('django.db.models.Model.save', autospec=True) as save:
+            self.profile.save(update_fields=['role', 'user'])
+
+        self.assertEqual(save.call_args.kwargs['update_fields'], ['role', 'user'])
+
+    def test_bulk_profile_creation(self):
+        with CaptureQueriesContext(connection) as queries, bulk_profile_creation():
+            users = [self.create_user(f'reader{i}') for i in range(3)]
+            self.assertFalse(UserProfile.objects.filter(user__in=users).exists())
+
+        inserts = [query for query in queries
+                   if query['sql'].startswith('INSERT') and 'INTO "relationship_app_userprofile"' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 3)
+
+    def test_failed_bulk_creation_creates_no_profiles(self):
+        with self.assertRaises(RuntimeError), bulk_profile_creation():
+            user = self.create_user('reader1')
+            raise RuntimeError
+
+        self.assertFalse(UserProfile.objects.filter(user=user).exists())
+        # Created when first needed
+        self.assertEqual(get_profile(user).user, user)
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+    def test_get_profile_returns_the_existing_one(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_profile(self.user), self.profile)
+
+
+class LibraryBooksFragmentTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        # Signed in, so that the whole page isn't cached
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password123',
+                                             date_of_birth=datetime.date(2000, 1, 1))
+        author = Author.objects.create(name='Frank Herbert')
+        self.dune = Book.objects.create(title='Dune', author=author)
+        self.messiah = Book.objects.create(title='Dune Messiah', author=author)
+        self.library = Library.objects.create(name='Central')
+        self.library.books.add(self.dune)
+
+    def get(self, library=None):
+        request = self.factory.get('/library_detail/')
+        request.user = self.user
+        response = LibraryDetailView.as_view()(request, pk=(library or self.library).pk)
+        return response.render().content.decode()
+
+    def test_fragment_is_cached(self):
+        self.assertIn('Dune by Frank Herbert', self.get())
+
+        # The library only: the book list comes from the fragment
+        with self.assertNumQueries(1):
+            self.assertIn('Dune by Frank Herbert', self.get())
+
+    def test_added_book_drops_the_fragment(self):
+        self.get()
+
+        self.library.books.add(self.messiah)
+
+        self.assertIn('Dune Messiah', self.get())
+
+    def test_removed_book_drops_the_fragment(self):
+        self.get()
+
+        self.library.books.remove(self.dune)
+
+        self.assertNotIn('Dune by', self.get())
+
+    def test_book_added_from_its_side_drops_the_fragment(self):
+        self.get()
+
+        self.messiah.library_set.add(self.library)
+
+        self.assertIn('Dune Messiah', self.get())
+
+    def test_cleared_books_drop_the_fragment(self):
+        self.get()
+
+        self.dune.library_set.clear()
+
+        self.assertNotIn('Dune by', self.get())
+
+    def test_deleted_book_drops_the_fragment(self):
+        self.get()
+
+        self.dune.delete()
+
+        self.assertNotIn('Dune by', self.get())
+
+    def test_other_libraries_keep_their_fragment(self):
+        other = Library.objects.create(name='Branch')
+        other.books.add(self.dune)
+        self.get(other)
+
+        self.library.books.add(self.messiah)
+
+        with self.assertNumQueries(1):
+            self.get(other)
 
-# Create your tests here.
@@ -8,13 +8,23 @@ from django.contrib.auth.decorators import permission_required
 from django.contrib.auth.forms import UserCreationForm
 from django.shortcuts import render
 from django.contrib.auth.decorators import user_passes_test
+from .roles import get_user_role
+from django.utils.decorators import method_decorator
+from LibraryProject.book_listing import render_book_list
+from LibraryProject.caches import cache_timeout
+from LibraryProject.page_cache import cache_anonymous_page
+from .caching import BOOK_ROW_CACHE_TIMEOUT, LIBRARY_CACHE_TIMEOUT, PAGE_NAMESPACE
 
 # Create your views here.
+@cache_anonymous_page(PAGE_NAMESPACE)
 def list_books(request):
-    books = Book.objects.all()
-    context = {'books': books}
-    return render(request, 'relationship_app/list_books.html', context)
+    # Keyset paginated, see LibraryProject.book_listing
+    books = Book.objects.select_related('author')
+    context = {'book_row_cache_timeout': BOOK_ROW_CACHE_TIMEOUT}
+    return render_book_list(request, 'relationship_app/list_books.html',
+                            'relationship_app/book_rows.html', books, context)
 
+@method_decorator(cache_anonymous_page(PAGE_NAMESPACE), name='dispatch')
 class LibraryDetailView(DetailView):
     model = Library
     template_name = 'relationship_app/library_detail.html'
@@ -22,7 +32,11 @@ class LibraryDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['books'] = self.objects.books.all()
+        # Books and their authors in one query, only run when the
+        # library_books fragment is not cached (see caching.py)
+        context['books'] = self.object.books.select_related('author').order_by('title')
+        context['library_cache_timeout'] = cache_timeout(LIBRARY_CACHE_TIMEOUT)
+        context['book_row_cache_timeout'] = BOOK_ROW_CACHE_TIMEOUT
         return context
 
 def register(request):
@@ -37,14 +51,15 @@ def register(request):
 
 
 # Helper functions to check roles
+# (roles come from the cache, see roles.py; users without a profile have no role)
 def is_admin(user):
-    return user.is_authenticated and user.userprofile.role == 'Admin'
+    return get_user_role(user) == 'Admin'
 
 def is_librarian(user):
-    return  user.is_authenticated and user.userprofile.role == 'Librarian'
+    return get_user_role(user) == 'Librarian'
 
 def is_member(user):
-    return user.is_authenticated and user.userprofile.role == 'Member'
+    return get_user_role(user) == 'Member'
 
 # The Admin View
 @user_passes_test(is_admin)
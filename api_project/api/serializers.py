@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from .models import Book
+from api_project.fieldsets import SparseFieldsetSerializerMixin
 
-class BookSerializer(serializers.ModelSerializer):
+# Supports ?fields= / ?exclude= on GET requests
+class BookSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ['title', 'author']
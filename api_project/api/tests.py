@@ -1,9 +1,10 @@
 from django.test import TestCase
 from rest_framework.test import APITestCase
-from rest_framework import status
+from rest_framework import serializers, status
 
-from advanced_features_and_security.LibraryProject.relationship_app.query_samples import author
+from api_project.fastpath import compile_serializer
 from .models import Book
+from .serializers import BookSerializer
 
 # Create your tests here.
 
@@ -19,4 +20,52 @@ class BookAPITestCase(APITestCase):
         self.assertEqual(response.data, [])
 
 
+class FastPathTests(APITestCase):
+
+    def setUp(self):
+        for title, author in [('Dune', 'Frank Herbert'), ('Emma', 'Jane Austen'), ('Beloved', 'Toni Morrison')]:
+            Book.objects.create(title=title, author=author)
+
+    def test_fast_path_matches_serializer_output(self):
+        books = Book.objects.order_by('id')
+        compiled = compile_serializer(BookSerializer())
+
+        self.assertIsNotNone(compiled)
+        self.assertEqual(compiled.to_representation(compiled.values(books)), BookSerializer(books, many=True).data)
+
+    def test_list_uses_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/books/', {'ordering': 'title'})
+
+        self.assertEqual(response.data, [
+            {'title': 'Beloved', 'author': 'Toni Morrison'},
+            {'title': 'Dune', 'author': 'Frank Herbert'},
+            {'title': 'Emma', 'author': 'Jane Austen'},
+        ])
+
+    def test_sparse_fields(self):
+        response = self.client.get('/api/books/', {'fields': 'title', 'ordering': 'title'})
+
+        self.assertEqual(response.data, [{'title': 'Beloved'}, {'title': 'Dune'}, {'title': 'Emma'}])
+
+    def test_own_to_representation_falls_back(self):
+        class AuthorFirstSerializer(BookSerializer):
+            def to_representation(self, instance):
+                return {'byline': f'{instance.author}: {instance.title}'}
+
+        self.assertIsNone(compile_serializer(AuthorFirstSerializer()))
+
+    def test_overridden_field_representation_is_converted(self):
+        class ShoutingField(serializers.CharField):
+            def to_representation(self, value):
+                return value.upper()
+
+        class ShoutingSerializer(BookSerializer):
+            title = ShoutingField()
+
+        books = Book.objects.order_by('id')
+        compiled = compile_serializer(ShoutingSerializer())
+
+        self.assertEqual(compiled.to_representation(compiled.values(books)),
+                         ShoutingSerializer(books, many=True).data)
 
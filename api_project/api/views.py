@@ -5,20 +5,23 @@ from .serializers import BookSerializer
 import rest_framework.viewsets
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework import filters
+from api_project.fieldsets import SparseFieldsetMixin
+from api_project.fastpath import FastPathListMixin
+from api_project.replicas import ReplicaReadMixin
 
 # Create your views here.
-class BookList(rest_framework.generics.ListAPIView):
+class BookList(ReplicaReadMixin, SparseFieldsetMixin, FastPathListMixin, rest_framework.generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
 
-class BookViewSet(rest_framework.viewsets.ModelViewSet):
+class BookViewSet(SparseFieldsetMixin, rest_framework.viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
 
     permission_classes = [IsAuthenticated]
 
 
-class BookListCreateView(rest_framework.generics.ListCreateAPIView):
+class BookListCreateView(ReplicaReadMixin, SparseFieldsetMixin, FastPathListMixin, rest_framework.generics.ListCreateAPIView):
     serializer_class = BookSerializer
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
     ordering_fields = ['title']
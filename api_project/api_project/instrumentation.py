@@ -0,0 +1,326 @@
+"""
+Per-view request instrumentation.
+
+InstrumentationMiddleware times every request and, through a database
+execute wrapper, counts its SQL queries, their time and the queries run
+more than once with the same SQL (N+1 patterns). Template and DRF response
+rendering and DRF serializer .data are timed separately.
+
+The numbers are aggregated per view in a process-local registry and exposed
+in the Prometheus text format by metrics_view (with METRICS_TOKEN only):
+a latency histogram, p50/p95/p99 over the last SAMPLE_SIZE requests, and
+query / duplicate query / render / serializer totals. Requests slower than
+INSTRUMENTATION_SLOW_REQUEST_MS are also logged as one JSON line.
+
+Each worker process keeps its own registry; let Prometheus scrape every
+worker (or sum over them).
+
+The projects of this repository run and deploy on their own, with no
+package in common, so each has the same copy of this module, as of
+sqlite.py. Change them together.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+SAMPLE_SIZE = 1000
+TOP_DUPLICATES = 5
+
+METRICS_VIEW_NAME = 'metrics'
+
+logger = logging.getLogger(__name__)
+
+_current_stats = ContextVar('request_stats', default=None)
+
+# IN (%s, %s, ...) lists of any length share a fingerprint
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+def fingerprint(sql):
+    return IN_LIST_RE.sub('(...)', sql)
+
+
+class RequestStats:
+    """What a single request did, filled in while it runs."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.fingerprints = Counter()
+        self.phases = Counter()
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - start
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicate_queries(self):
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    def top_duplicates(self):
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.fingerprints.most_common(TOP_DUPLICATES) if count > 1
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection, for the request running the query."""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.query_wrapper(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    # Async views query from other threads, hence a wrapper on every connection
+    # rather than execute_wrapper() on the request thread's. Inserted first:
+    # execute_wrapper() blocks remove their wrapper from the end.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def record_phase(name, seconds):
+    """Adds `seconds` to the `name` phase of the current request, if any."""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.phases[name] += seconds
+
+
+@contextmanager
+def timed_phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
+
+
+class ViewMetrics:
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+        self.queries = 0
+        self.query_time = 0.0
+        self.duplicate_queries = 0
+        self.phases = Counter()
+
+    def observe(self, duration, stats):
+        for position, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                self.buckets[position] += 1
+        self.count += 1
+        self.total += duration
+        self.samples.append(duration)
+        self.queries += stats.queries
+        self.query_time += stats.query_time
+        self.duplicate_queries += stats.duplicate_queries
+        self.phases.update(stats.phases)
+
+    def quantiles(self):
+        samples = sorted(self.samples)
+        return {q: samples[min(int(q * len(samples)), len(samples) - 1)] for q in QUANTILES}
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view, duration, stats):
+        with self.lock:
+            if view not in self.views:
+                self.views[view] = ViewMetrics()
+            self.views[view].observe(duration, stats)
+
+    def render_prometheus(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        with self.lock:
+            views = sorted((escape_label(view), metrics) for view, metrics in self.views.items())
+
+            histogram = []
+            for view, metrics in views:
+                for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                    histogram.append(f'django_view_request_seconds_bucket{{view="{view}",le="{bound}"}} {count}')
+                histogram.append(f'django_view_request_seconds_bucket{{view="{view}",le="+Inf"}} {metrics.count}')
+                histogram.append(f'django_view_request_seconds_sum{{view="{view}"}} {metrics.total}')
+                histogram.append(f'django_view_request_seconds_count{{view="{view}"}} {metrics.count}')
+            metric('django_view_request_seconds', 'histogram', 'Request latency by view.', histogram)
+
+            metric('django_view_request_quantile_seconds', 'gauge',
+                   f'Request latency quantiles by view, over the last {SAMPLE_SIZE} requests.', [
+                       f'django_view_request_quantile_seconds{{view="{view}",quantile="{q}"}} {value}'
+                       for view, metrics in views for q, value in metrics.quantiles().items()
+                   ])
+
+            counters = [
+                ('django_view_queries_total', 'SQL queries by view.', lambda m: m.queries),
+                ('django_view_query_seconds_total', 'Time spent in SQL by view.', lambda m: m.query_time),
+                ('django_view_duplicate_queries_total', 'Repeated SQL queries (same SQL in one request) by view.',
+                 lambda m: m.duplicate_queries),
+                ('django_view_render_seconds_total', 'Time spent rendering responses by view.',
+                 lambda m: m.phases['render']),
+                ('django_view_serializer_seconds_total', 'Time spent in serializer .data by view.',
+                 lambda m: m.phases['serializer']),
+            ]
+            for name, help_text, value in counters:
+                metric(name, 'counter', help_text, [
+                    f'{name}{{view="{view}"}} {value(metrics)}' for view, metrics in views
+                ])
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def instrument_serializers():
+    """Times the top-level .data of DRF serializers (list and single object)."""
+    from rest_framework import serializers
+
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        data = serializer_class.data
+        if getattr(data.fget, 'instrumented', False):
+            continue
+
+        def timed_data(fget):
+            @wraps(fget)
+            def wrapper(self):
+                with timed_phase('serializer'):
+                    return fget(self)
+            wrapper.instrumented = True
+            return wrapper
+
+        serializer_class.data = property(timed_data(data.fget))
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class InstrumentationMiddleware:
+    """
+    Records the metrics of every request, see the module docstring.
+    Should be the first middleware, so the whole request is measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', 500)
+        if apps.is_installed('rest_framework'):
+            instrument_serializers()
+        connection_created.connect(install_query_recorder, dispatch_uid='instrumentation')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            self.install_query_recorders()
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.observe(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            self.install_query_recorders()
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.observe(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def install_query_recorders(self):
+        # Connections opened before the middleware was loaded
+        for alias in connections:
+            install_query_recorder(connections[alias])
+
+    def observe(self, request, response, stats, duration):
+        view = view_label(request)
+        if view != METRICS_VIEW_NAME:
+            registry.observe(view, duration, stats)
+
+        if duration * 1000 >= self.slow_request_ms:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'queries': stats.queries,
+                'query_ms': round(stats.query_time * 1000, 2),
+                'duplicate_queries': stats.duplicate_queries,
+                'top_duplicates': stats.top_duplicates(),
+                'render_ms': round(stats.phases['render'] * 1000, 2),
+                'serializer_ms': round(stats.phases['serializer'] * 1000, 2),
+            }))
+
+    def process_template_response(self, request, response):
+        # Template and DRF responses are rendered after the view returns
+        start = time.perf_counter()
+        response.add_post_render_callback(lambda response: record_phase('render', time.perf_counter() - start))
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition, for requests with an Authorization: Bearer
+    METRICS_TOKEN header; not found without a METRICS_TOKEN. The client
+    address is not trusted: behind a reverse proxy on the same host, every
+    client comes from 127.0.0.1.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if not token or scheme.lower() != 'bearer' or not constant_time_compare(credentials.strip(), token):
+        raise Http404
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from api_project.sqlite import parse_pragmas, sqlite_options
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,19 +57,65 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # orjson renderer/parser (fall back to the stdlib json encoder if orjson is missing)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api_project.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api_project.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 MIDDLEWARE = [
+    # First, so it measures the whole request
+    'api_project.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api_project.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'api_project.replicas.ReplicaPinMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Requests slower than this (in milliseconds) are logged by the instrumentation middleware
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+
+# Bearer token to scrape the Prometheus metrics at /metrics/ (disabled if empty),
+# e.g. bearer_token in the Prometheus scrape config
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        # Slow request records are already JSON
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'instrumentation': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'api_project.instrumentation': {
+            'handlers': ['instrumentation'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Responses smaller than this (in bytes) are not compressed
+COMPRESSION_MIN_SIZE = 1024
+
 ROOT_URLCONF = 'api_project.urls'
 
 TEMPLATES = [
@@ -90,13 +139,50 @@ WSGI_APPLICATION = 'api_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite tuned for concurrent requests (see api_project/sqlite.py), pragmas can be
+# changed with e.g. SQLITE_PRAGMAS=synchronous=FULL,mmap_size=0
+SQLITE_PRAGMAS = parse_pragmas(os.getenv('SQLITE_PRAGMAS', ''))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': sqlite_options(**SQLITE_PRAGMAS),
     }
 }
 
+# Read replicas for the book lists (see api_project/replicas.py): SQLite files such as
+# copies of db.sqlite3, e.g. DATABASE_REPLICA_FILES=replica1.sqlite3,replica2.sqlite3
+DATABASE_REPLICAS = []
+for position, name in enumerate(filter(None, os.getenv('DATABASE_REPLICA_FILES', '').split(',')), 1):
+    DATABASES[f'replica{position}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': sqlite_options(**SQLITE_PRAGMAS),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{position}')
+
+DATABASE_ROUTERS = ['api_project.replicas.ReplicaRouter']
+
+# Seconds a client reads from the primary database after a write
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache shared by the worker processes, e.g. CACHE_URL=redis://127.0.0.1:6379/0
+# (needs redis-py). Without it each process has its own cache, and a user's replica pin
+# (see api_project/replicas.py) only holds on the worker that took the write
+CACHE_URL = os.getenv('CACHE_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
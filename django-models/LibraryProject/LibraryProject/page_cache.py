@@ -0,0 +1,104 @@
+"""
+Whole-page caching for anonymous visitors.
+
+Views decorated with cache_anonymous_page(namespace) serve GET requests of
+anonymous users from the cache. The cache keys contain a version number per
+namespace; the apps bump it with invalidate_pages(namespace) from their
+model signals, which drops every cached page of the namespace at once.
+
+Authenticated users always get a freshly rendered page, as do visitors with
+session data or messages, and requests whose response sets cookies or a CSRF
+token. The session and message cookies are only added by the outer
+middleware once the view has returned, so the session and the messages are
+checked themselves rather than response.cookies.
+
+Other worker processes only see a version bump through a shared cache
+(CACHE_URL): with a per-process cache, pages are only kept a few seconds
+(see caches.py).
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+
+from .caches import cache_timeout
+
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+
+def page_version_key(namespace):
+    return f'pages:{namespace}:version'
+
+
+def get_page_version(namespace):
+    version = cache.get(page_version_key(namespace))
+    if version is None:
+        version = 1
+        cache.add(page_version_key(namespace), version, None)
+    return version
+
+
+def invalidate_pages(namespace):
+    try:
+        cache.incr(page_version_key(namespace))
+    except ValueError:
+        cache.set(page_version_key(namespace), 2, None)
+
+
+def page_cache_key(namespace, request):
+    url = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False).hexdigest()
+    return f'pages:{namespace}:{get_page_version(namespace)}:{url}'
+
+
+def has_visitor_state(request):
+    """
+    Whether the page may show something of this visitor's own, or get a
+    session or messages cookie from SessionMiddleware / MessageMiddleware.
+    """
+    session = getattr(request, 'session', None)
+    if session is not None and (session.modified or not session.is_empty()):
+        return True
+    messages = getattr(request, '_messages', None)
+    return messages is not None and (messages.added_new or len(messages) > 0)
+
+
+def is_cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not has_visitor_state(request)
+        and 'private' not in response.get('Cache-Control', '')
+        # The page contains a CSRF token
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def cache_anonymous_page(namespace, timeout=PAGE_CACHE_TIMEOUT):
+    """View decorator, see the module docstring."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                    or has_visitor_state(request)):
+                return view_func(request, *args, **kwargs)
+
+            key = page_cache_key(namespace, request)
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view_func(request, *args, **kwargs)
+
+            def store(response):
+                if is_cacheable(request, response):
+                    cache.set(key, response, cache_timeout(timeout))
+
+            # TemplateResponses are only rendered after the view returns
+            if hasattr(response, 'render') and callable(response.render) and not response.is_rendered:
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+        return wrapper
+    return decorator
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from LibraryProject.sqlite import parse_pragmas, sqlite_options
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -28,6 +31,12 @@ DEBUG = True
 ALLOWED_HOSTS = []
 
 
+# ModelBackend with user permissions cached across requests
+AUTHENTICATION_BACKENDS = [
+    'relationship_app.backends.CachedPermissionBackend',
+]
+
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -42,23 +51,62 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it measures the whole request
+    'LibraryProject.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'relationship_app.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Requests slower than this (in milliseconds) are logged by the instrumentation middleware
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+
+# Bearer token to scrape the Prometheus metrics at /metrics/ (disabled if empty),
+# e.g. bearer_token in the Prometheus scrape config
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        # Slow request records are already JSON
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'instrumentation': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'LibraryProject.instrumentation': {
+            'handlers': ['instrumentation'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'LibraryProject.urls'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / "templates" ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parsed templates are kept in memory (also with DEBUG = True;
+            # edited templates are picked up by the autoreloader)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -74,14 +122,34 @@ WSGI_APPLICATION = 'LibraryProject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite tuned for concurrent requests (see LibraryProject/sqlite.py), pragmas can be
+# changed with e.g. SQLITE_PRAGMAS=synchronous=FULL,mmap_size=0
+SQLITE_PRAGMAS = parse_pragmas(os.getenv('SQLITE_PRAGMAS', ''))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': sqlite_options(**SQLITE_PRAGMAS),
     }
 }
 
 
+# Cache shared by the worker processes, e.g. CACHE_URL=redis://127.0.0.1:6379/0
+# (needs redis-py). Without it each process has its own cache, and the cached pages and roles are
+# kept a few seconds only (see LibraryProject/caches.py)
+CACHE_URL = os.getenv('CACHE_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class RelationshipAppConfig(AppConfig):
     name = 'relationship_app'
+
+    def ready(self):
+        # Keeps the cached permissions of CachedPermissionBackend up to date
+        from .backends import connect_signals
+        connect_signals()
+        # Registers the signal handlers that keep cached roles and pages up to date
+        from . import caching, roles  # noqa: F401
@@ -0,0 +1,79 @@
+"""
+Authentication backend with cached permissions.
+
+ModelBackend loads a user's own and group permissions from the database on
+every request (permission_required on the add/edit/delete book views). This
+backend keeps the resulting permission set in the cache, keyed by user id and
+a permissions version stamp. Any change to group membership, user or group
+permissions, groups or permissions bumps the version, so every cached set is
+dropped at once.
+
+Other worker processes only see a version bump through a shared cache
+(CACHE_URL): with a per-process cache, a revoked permission would stay
+granted there until the cached set expires, so the sets are only kept a few
+seconds (see LibraryProject/caches.py).
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from LibraryProject.caches import cache_timeout
+
+PERMISSION_CACHE_TIMEOUT = 60 * 60
+PERMISSION_VERSION_KEY = 'relationship_app:permissions:version'
+
+
+def get_permissions_version():
+    version = cache.get(PERMISSION_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(PERMISSION_VERSION_KEY, version, None)
+    return version
+
+
+def bump_permissions_version(**kwargs):
+    """Signal handler: invalidates every cached permission set."""
+    try:
+        cache.incr(PERMISSION_VERSION_KEY)
+    except ValueError:
+        cache.set(PERMISSION_VERSION_KEY, 2, None)
+
+
+def m2m_permissions_changed(action, **kwargs):
+    if action.startswith('post_'):
+        bump_permissions_version()
+
+
+def permission_cache_key(user):
+    # Superusers get every permission, so the flag is part of the key
+    return f'relationship_app:permissions:{user.pk}:{int(user.is_superuser)}:{get_permissions_version()}'
+
+
+class CachedPermissionBackend(ModelBackend):
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+
+        # Also kept on the user object for the rest of the request
+        if not hasattr(user_obj, '_cached_permissions'):
+            key = permission_cache_key(user_obj)
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = frozenset(super().get_all_permissions(user_obj))
+                cache.set(key, permissions, cache_timeout(PERMISSION_CACHE_TIMEOUT))
+            user_obj._cached_permissions = permissions
+
+        return user_obj._cached_permissions
+
+
+def connect_signals():
+    """Called from RelationshipAppConfig.ready()."""
+    User = get_user_model()
+    for through in (User.groups.through, User.user_permissions.through, Group.permissions.through):
+        m2m_changed.connect(m2m_permissions_changed, sender=through)
+    for model in (Group, Permission):
+        post_save.connect(bump_permissions_version, sender=model)
+        post_delete.connect(bump_permissions_version, sender=model)
@@ -0,0 +1,18 @@
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_user_role
+
+
+class RoleMiddleware:
+    """
+    Sets request.role to the user's role ('Admin', 'Librarian', 'Member' or None).
+    The role is only looked up when request.role is used, and comes from the cache.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: get_user_role(request.user))
+        return self.get_response(request)
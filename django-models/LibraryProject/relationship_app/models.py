@@ -1,4 +1,6 @@
 from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -13,6 +15,8 @@ class Author(models.Model):
 class Book(models.Model):
     title = models.CharField(max_length=100)
     author = models.ForeignKey(Author, on_delete=models.PROTECT)
+    # Part of the template fragment cache keys of the book
+    updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -39,6 +43,17 @@ class Librarian(models.Model):
     def __str__(self):
         return self.name
 
+class UserProfileManager(models.Manager):
+
+    def create_missing(self, users):
+        """Creates, in one query, the profiles missing for `users`."""
+        users = [user for user in users if user.pk is not None]
+        existing = set(self.filter(user__in=users).values_list('user_id', flat=True))
+        return self.bulk_create(
+            [self.model(user=user) for user in users if user.pk not in existing],
+            ignore_conflicts=True,
+        )
+
 class UserProfile(models.Model):
     # The list of predefined roles
     ROLE_CHOICES = [
@@ -51,15 +66,79 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
 
+    objects = UserProfileManager()
+
     def __str__(self):
         return f"{self.user.name} - {self.role}"
 
-    # This function runs every time a User object is saved
-    @receiver(post_save, sender=User)
-    def create_user_profile(sender, instance, created, **kwargs):
-        if created:
-            UserProfile.objects.create(user=instance)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so save() only writes what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_dirty_fields(self):
+        """
+        Returns the fields changed since the profile was loaded,
+        or None if it wasn't loaded from the database.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [name for name, value in loaded.items()
+                if name != self._meta.pk.attname and getattr(self, name) != value]
+
+    def save(self, *args, **kwargs):
+        # Skip the UPDATE entirely when nothing changed, otherwise only write the dirty fields
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            dirty = self.get_dirty_fields()
+            if dirty == []:
+                return
+            if dirty:
+                kwargs['update_fields'] = dirty
+
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+
+# New users created inside bulk_profile_creation(), waiting for their profile
+_pending_profiles = ContextVar('pending_profiles', default=None)
+
+
+@contextmanager
+def bulk_profile_creation():
+    """
+    For user imports: profiles of the users created inside the block are
+    inserted with a single bulk_create when the block exits.
+    If the block fails, no profiles are created; get_profile() creates
+    missing ones lazily.
+    """
+    pending = []
+    token = _pending_profiles.set(pending)
+    try:
+        yield
+    finally:
+        _pending_profiles.reset(token)
+    UserProfile.objects.create_missing(pending)
+
+
+def get_profile(user):
+    """Returns the user's profile, creating it if it doesn't exist yet."""
+    profile, created = UserProfile.objects.get_or_create(user=user)
+    return profile
+
+
+# This function runs every time a User object is saved.
+# Only new users need work: nothing on the profile depends on User fields, so
+# ordinary saves (e.g. the last_login update at each login) don't touch UserProfile.
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
 
-    @receiver(post_save, sender=User)
-    def save_user_profile(sender, instance, **kwargs):
-        instance.userprofile.save()
\ No newline at end of file
+    pending = _pending_profiles.get()
+    if pending is not None:
+        pending.append(instance)
+    else:
+        UserProfile.objects.create(user=instance)
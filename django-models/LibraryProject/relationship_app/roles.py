@@ -0,0 +1,58 @@
+"""
+Cached role lookup for the role-gated views.
+
+A user's role is read from UserProfile once, then kept in the cache (keyed by
+user id) and on the user object, so admin_view / librarian_view / member_view
+do not query UserProfile on every request. Saving or deleting a UserProfile
+updates the cached value.
+
+Other worker processes only see role changes through a shared cache
+(CACHE_URL): with a per-process cache, roles are only kept a few seconds
+(see LibraryProject/caches.py).
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from LibraryProject.caches import cache_timeout
+
+from .models import UserProfile
+
+ROLE_CACHE_TIMEOUT = 60 * 15
+
+# Cached for users without a profile, so they don't hit the database either
+NO_ROLE = ''
+
+
+def role_cache_key(user_id):
+    return f'relationship_app:role:{user_id}'
+
+
+def get_user_role(user):
+    """
+    Returns the role of `user` ('Admin', 'Librarian', 'Member'),
+    or None for anonymous users and users without a profile.
+    """
+    if not user.is_authenticated:
+        return None
+
+    role = getattr(user, '_cached_role', None)
+    if role is None:
+        key = role_cache_key(user.pk)
+        role = cache.get(key)
+        if role is None:
+            role = UserProfile.objects.filter(user_id=user.pk).values_list('role', flat=True).first() or NO_ROLE
+            cache.set(key, role, cache_timeout(ROLE_CACHE_TIMEOUT))
+        user._cached_role = role
+
+    return role or None
+
+
+@receiver(post_save, sender=UserProfile)
+def update_cached_role(sender, instance, **kwargs):
+    cache.set(role_cache_key(instance.user_id), instance.role or NO_ROLE, cache_timeout(ROLE_CACHE_TIMEOUT))
+
+
+@receiver(post_delete, sender=UserProfile)
+def clear_cached_role(sender, instance, **kwargs):
+    cache.delete(role_cache_key(instance.user_id))
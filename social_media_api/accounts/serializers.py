@@ -2,8 +2,9 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 from .models import CustomUser
+from social_media_api.fieldsets import SparseFieldsetSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField()
 
     class Meta:
@@ -0,0 +1,46 @@
+"""
+Benchmarks for the social media API.
+
+Run them from the project directory, e.g.:
+
+    python -m benchmarks.bench_serializers
+
+Each benchmark runs against a throwaway test database, except
+bench_connections, which only runs SELECT 1 on the configured database.
+"""
+import os
+import time
+
+
+def setup_django(database_name=None, test_database=True):
+    """
+    Configures Django and, unless test_database is false, creates a test
+    database for the benchmark run, in memory unless a database_name (a file,
+    on SQLite) is given.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-only-secret-key')
+
+    import django
+    django.setup()
+    if not test_database:
+        return
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    if database_name is not None:
+        connection.settings_dict['TEST']['NAME'] = database_name
+    connection.creation.create_test_db(verbosity=0)
+
+
+def timeit(func, repeat=5):
+    """Returns the best wall time of `repeat` calls to func, in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -0,0 +1,134 @@
+"""
+How many concurrent clients the feed serves under WSGI and under ASGI.
+
+    python -m benchmarks.bench_asgi [db_latency_ms] [wsgi_threads] [connections ...]
+
+Every SQL query is delayed by db_latency_ms (default 50), standing in for the
+round trip to a busy database server. WSGI serves the requests with a fixed pool
+of wsgi_threads worker threads (default 8, like gunicorn --threads), through
+the test Client; ASGI from one event loop, through the AsyncClient. Each of
+the concurrent connections (default 8, 32 and 128) sends
+REQUESTS_PER_CONNECTION feed requests; latencies include the time spent
+waiting for a free worker.
+
+ASGI only pays off while requests mostly wait on the database: each request
+also crosses to worker threads a dozen times (the sync parts of Django and
+DRF), which costs more CPU than a WSGI request. With a few milliseconds per
+query, and on a single core, WSGI serves more requests per second.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+REQUESTS_PER_CONNECTION = 10
+
+
+def add_latency(seconds):
+    """Delays every query of every connection by `seconds`."""
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    for alias in connections:
+        install(connections[alias])
+
+
+def run_wsgi(requests_by_connection, credentials, threads):
+    from django.test import Client
+
+    workers = threading.Semaphore(threads)
+    local = threading.local()
+
+    def connection(requests):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        results = []
+        for request in requests:
+            start = time.perf_counter()
+            with workers:
+                status = local.client.get(
+                    request.path, secure=True, headers=credentials.headers[request.user_id]).status_code
+            results.append((time.perf_counter() - start, status))
+        return results
+
+    with ThreadPoolExecutor(len(requests_by_connection)) as executor:
+        return [result for results in executor.map(connection, requests_by_connection) for result in results]
+
+
+def run_asgi(requests_by_connection, credentials):
+    from asgiref.sync import ThreadSensitiveContext
+    from django.test import AsyncClient
+
+    async def connection(requests):
+        client = AsyncClient()
+        results = []
+        for request in requests:
+            start = time.perf_counter()
+            # As ASGIHandler does, unlike the AsyncClient: without it the sync
+            # parts of all the requests share a single thread
+            async with ThreadSensitiveContext():
+                response = await client.get(
+                    request.path, secure=True, headers=credentials.headers[request.user_id])
+            results.append((time.perf_counter() - start, response.status_code))
+        return results
+
+    async def main():
+        return await asyncio.gather(*(connection(requests) for requests in requests_by_connection))
+
+    return [result for results in asyncio.run(main()) for result in results]
+
+
+def main(db_latency_ms=50, wsgi_threads=8, *connection_counts):
+    directory = tempfile.TemporaryDirectory()
+    setup_django(database_name=os.path.join(directory.name, 'bench.sqlite3'))
+
+    import logging
+    import random
+
+    from django.db import connection
+
+    from benchmarks.graph import generate_graph
+    from benchmarks.loadtest import Credentials, feed_read, summarize
+
+    graph = generate_graph(users=300)
+    rng = random.Random(0)
+    active = rng.sample(graph.user_ids, 100)
+    credentials = Credentials(active)
+    connection.close()
+    logging.getLogger('social_media_api.instrumentation').setLevel(logging.ERROR)
+    add_latency(db_latency_ms / 1000)
+
+    print(f'feed, {db_latency_ms} ms per query, {wsgi_threads} WSGI threads, '
+          f'{REQUESTS_PER_CONNECTION} requests per connection')
+    print(f"{'server':<6}{'connections':>12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for count in connection_counts or (8, 32, 128):
+        requests_by_connection = [feed_read(graph, active, rng, REQUESTS_PER_CONNECTION) for _ in range(count)]
+        for server in ('wsgi', 'asgi'):
+            start = time.perf_counter()
+            if server == 'wsgi':
+                results = run_wsgi(requests_by_connection, credentials, wsgi_threads)
+            else:
+                results = run_asgi(requests_by_connection, credentials)
+            summary = summarize(results, time.perf_counter() - start)
+            print(f"{server:<6}{count:>12}{summary['throughput']:>10}{summary['p50_ms']:>10}"
+                  f"{summary['p95_ms']:>10}{summary['p99_ms']:>10}{summary['errors']:>8}")
+
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
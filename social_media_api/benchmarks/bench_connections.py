@@ -0,0 +1,115 @@
+"""
+Cost of getting a database connection at the start of a request, with
+connections opened per request, kept open (with and without health checks)
+and pooled (PostgreSQL with psycopg 3 only, set DATABASE_URL).
+
+    python -m benchmarks.bench_connections [requests_per_thread] [concurrency ...]
+
+Each thread runs requests_per_thread simulated requests: the request_started
+signal, a cursor (the connection acquisition, timed) running SELECT 1, and
+the request_finished signal.
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+
+class Counter:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def increment(self):
+        with self.lock:
+            self.value += 1
+
+
+def simulate_requests(count):
+    from django.core.signals import request_finished, request_started
+    from django.db import connection
+
+    acquisitions = []
+    for _ in range(count):
+        start = time.perf_counter()
+        request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            acquisitions.append(time.perf_counter() - start)
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        request_finished.send(sender=None)
+    connection.close()
+    return acquisitions
+
+
+def modes(settings_dict):
+    from django.conf import settings
+
+    yield 'per request', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+    yield 'persistent', {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False}
+    yield 'persistent + checks', {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}
+    if settings_dict['ENGINE'] == 'django.db.backends.postgresql':
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            return
+        yield 'pool + checks', {
+            'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {**settings_dict['OPTIONS'], 'pool': dict(settings.DATABASE_POOL_OPTIONS)},
+        }
+
+
+def main(requests=200, *concurrency_levels):
+    setup_django(test_database=False)
+
+    from django.db import DEFAULT_DB_ALIAS, connections
+
+    settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+    original = dict(settings_dict)
+    wrapper_class = type(connections[DEFAULT_DB_ALIAS])
+    get_new_connection = wrapper_class.get_new_connection
+    opened = Counter()
+
+    def counting_get_new_connection(self, conn_params):
+        opened.increment()
+        return get_new_connection(self, conn_params)
+
+    wrapper_class.get_new_connection = counting_get_new_connection
+    connections[DEFAULT_DB_ALIAS].close()
+
+    print(f"{settings_dict['ENGINE'].rsplit('.', 1)[-1]}, {requests} requests per thread")
+    print(f"{'threads':>7}  {'mode':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}{'opened':>8}")
+    for concurrency in concurrency_levels or (1, 4, 16):
+        for name, overrides in modes(original):
+            settings_dict.clear()
+            settings_dict.update(original, **overrides)
+            opened.value = 0
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as executor:
+                results = list(executor.map(simulate_requests, [requests] * concurrency))
+            elapsed = time.perf_counter() - start
+
+            pooled = 'pool' in settings_dict.get('OPTIONS', {})
+            if pooled:
+                # Every acquisition goes through get_new_connection(), count the pool's own
+                pool = wrapper_class._connection_pools.pop(DEFAULT_DB_ALIAS)
+                opened.value = pool.get_stats().get('connections_num', 0)
+                pool.close()
+
+            acquisitions = sorted(seconds for thread in results for seconds in thread)
+            p50, p95, p99 = (acquisitions[min(int(q * len(acquisitions)), len(acquisitions) - 1)] * 1000
+                             for q in (0.5, 0.95, 0.99))
+            print(f'{concurrency:>7}  {name:<20}{p50:>9.3f}{p95:>9.3f}{p99:>9.3f}'
+                  f'{len(acquisitions) / elapsed:>10.0f}{opened.value:>8}')
+
+    wrapper_class.get_new_connection = get_new_connection
+    settings_dict.clear()
+    settings_dict.update(original)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,78 @@
+"""
+One post read by everyone: its detail endpoint with and without the hot post
+cache (see posts/caching.py).
+
+    python -m benchmarks.bench_hot_posts [db_latency_ms] [requests] [threads]
+
+Every SQL query is delayed by db_latency_ms (default 2, see
+benchmarks.bench_asgi). `threads` threads (default 16) send `requests`
+(default 2000) GET requests for the same post, as different users. Prints
+the requests per second, their latencies and the queries loading the post.
+"""
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import setup_django
+
+
+def main(db_latency_ms=2, requests=2000, threads=16):
+    directory = tempfile.TemporaryDirectory()
+    setup_django(database_name=f'{directory.name}/bench.sqlite3')
+
+    import logging
+    import random
+
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    from django.urls import reverse
+
+    from benchmarks.bench_asgi import add_latency
+    from benchmarks.graph import generate_graph
+    from benchmarks.loadtest import ClientDriver, Credentials, Request, summarize
+    from posts.caching import hot_posts
+
+    graph = generate_graph(users=300)
+    rng = random.Random(0)
+    active = rng.sample(graph.user_ids, 100)
+    post_id = graph.posts_by[graph.popular_user(rng)][0]
+    path = reverse('post-detail', args=[post_id])
+    driver = ClientDriver(Credentials(active))
+    connection.close()
+    logging.getLogger('social_media_api.instrumentation').setLevel(logging.ERROR)
+    add_latency(db_latency_ms / 1000)
+
+    lock = threading.Lock()
+    loads = []
+
+    def count_loads(execute, sql, params, many, context):
+        if sql.startswith('SELECT') and 'FROM "posts_post"' in sql:
+            with lock:
+                loads.append(sql)
+        return execute(sql, params, many, context)
+
+    connection_created.connect(
+        lambda connection, **kwargs: connection.execute_wrappers.append(count_loads), weak=False)
+
+    print(f'post detail, {db_latency_ms} ms per query, {requests} requests, {threads} threads')
+    print(f"{'cache':<8}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'post loads':>12}")
+    threshold = hot_posts.threshold
+    for cached in (False, True):
+        hot_posts.clear()
+        hot_posts.threshold = threshold if cached else float('inf')
+        loads.clear()
+
+        start = time.perf_counter()
+        results = driver.run([Request('GET', path, rng.choice(active)) for _ in range(requests)], threads)
+        summary = summarize(results, time.perf_counter() - start)
+        print(f"{'on' if cached else 'off':<8}{summary['throughput']:>8}{summary['p50_ms']:>9}"
+              f"{summary['p99_ms']:>9}{summary['errors']:>8}{len(loads):>12}")
+
+    hot_posts.threshold = threshold
+    connection.close()
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
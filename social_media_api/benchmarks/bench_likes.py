@@ -0,0 +1,81 @@
+"""
+A like storm on the posts of a few popular authors, with the likes written
+by the like view and written behind (see posts/likes.py).
+
+    python -m benchmarks.bench_likes [db_latency_ms] [requests] [concurrency]
+
+Every SQL query is delayed by db_latency_ms (default 2, see
+benchmarks.bench_asgi). `requests` likes (default 1000) are sent through the
+AsyncClient by `concurrency` tasks (default 32). Prints the answered
+requests per second and their latencies, the seconds until every like is
+written (the final flush included), and the INSERT, UPDATE and DELETE
+statements run.
+"""
+import sys
+import tempfile
+import time
+
+from benchmarks import setup_django
+
+
+def main(db_latency_ms=2, requests=1000, concurrency=32):
+    directory = tempfile.TemporaryDirectory()
+    setup_django(database_name=f'{directory.name}/bench.sqlite3')
+
+    import logging
+    import random
+
+    from django.conf import settings
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+
+    from benchmarks.bench_asgi import add_latency
+    from benchmarks.graph import generate_graph
+    from benchmarks.loadtest import AsyncClientDriver, Credentials, like_storm, summarize
+    from posts import likes
+    from posts.models import Like
+
+    graph = generate_graph(users=1000, likes_per_post=0)
+    rng = random.Random(0)
+    active = rng.sample(graph.user_ids, 500)
+    driver = AsyncClientDriver(Credentials(active))
+    connection.close()
+    logging.getLogger('social_media_api.instrumentation').setLevel(logging.ERROR)
+    add_latency(db_latency_ms / 1000)
+
+    writes = []
+
+    def count_writes(execute, sql, params, many, context):
+        if sql.startswith(('INSERT', 'UPDATE', 'DELETE')):
+            writes.append(sql)
+        return execute(sql, params, many, context)
+
+    connection_created.connect(
+        lambda connection, **kwargs: connection.execute_wrappers.append(count_writes), weak=False)
+
+    print(f'like storm, {db_latency_ms} ms per query, {requests} requests, {concurrency} tasks')
+    print(f"{'mode':<14}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'written s':>11}{'likes':>7}{'writes':>8}")
+    for write_behind in (False, True):
+        settings.LIKE_WRITE_BEHIND = write_behind
+        settings.LIKE_WRITE_BEHIND_LOG_DIR = f'{directory.name}/likes'
+        likes._buffer = None
+        before = Like.objects.count()
+        writes.clear()
+
+        start = time.perf_counter()
+        results = driver.run(like_storm(graph, active, rng, requests), concurrency)
+        summary = summarize(results, time.perf_counter() - start)
+        if write_behind:
+            likes.get_like_buffer().stop()
+        written = time.perf_counter() - start
+
+        print(f"{'write-behind' if write_behind else 'direct':<14}{summary['throughput']:>8}"
+              f"{summary['p50_ms']:>9}{summary['p99_ms']:>9}{written:>11.2f}"
+              f'{Like.objects.count() - before:>7}{len(writes):>8}')
+
+    connection.close()
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,40 @@
+"""
+Compares DRF's JSONRenderer with the orjson FastJSONRenderer on a feed.
+
+    python -m benchmarks.bench_renderers [number_of_posts]
+"""
+import sys
+
+from benchmarks import setup_django, timeit
+
+
+def main(count=1000):
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+
+    from posts.models import Post
+    from posts.serializers import PostSerializer
+    from social_media_api.renderers import FastJSONRenderer, orjson
+
+    author = get_user_model().objects.create_user(username='bench', password='bench-password')
+    Post.objects.bulk_create(
+        Post(author=author, title=f'Post {i}', content='Lorem ipsum dolor sit amet. ' * 20)
+        for i in range(count)
+    )
+    feed = PostSerializer(Post.objects.select_related('author').order_by('-created_at'), many=True).data
+
+    stdlib, fast = JSONRenderer(), FastJSONRenderer()
+    assert stdlib.render(feed) == fast.render(feed), 'outputs differ'
+
+    stdlib_ms = timeit(lambda: stdlib.render(feed), repeat=20)
+    fast_ms = timeit(lambda: fast.render(feed), repeat=20)
+    print(f'{count} post feed ({len(fast.render(feed))} bytes)')
+    print(f'  JSONRenderer:     {stdlib_ms:8.2f} ms')
+    print(f'  FastJSONRenderer: {fast_ms:8.2f} ms  ({stdlib_ms / fast_ms:.1f}x)'
+          + ('' if orjson else '  [orjson not installed, stdlib fallback]'))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
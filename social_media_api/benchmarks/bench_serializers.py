@@ -0,0 +1,46 @@
+"""
+Compares PostSerializer(many=True) with the compiled fast path.
+
+    python -m benchmarks.bench_serializers [number_of_posts]
+"""
+import sys
+
+from benchmarks import setup_django, timeit
+
+
+def main(count=1000):
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+
+    from posts.models import Post
+    from posts.serializers import PostSerializer
+    from social_media_api.fastpath import compile_serializer
+
+    author = get_user_model().objects.create_user(username='bench', password='bench-password')
+    Post.objects.bulk_create(
+        Post(author=author, title=f'Post {i}', content='Lorem ipsum dolor sit amet. ' * 20)
+        for i in range(count)
+    )
+    posts = Post.objects.select_related('author').order_by('id')
+    compiled = compile_serializer(PostSerializer())
+
+    def regular():
+        return PostSerializer(posts.all(), many=True).data
+
+    def fast():
+        return compiled.to_representation(compiled.values(posts.all()))
+
+    renderer = JSONRenderer()
+    assert renderer.render(regular()) == renderer.render(fast()), 'outputs differ'
+
+    regular_ms = timeit(regular)
+    fast_ms = timeit(fast)
+    print(f'{count} posts')
+    print(f'  ModelSerializer: {regular_ms:8.2f} ms')
+    print(f'  fast path:       {fast_ms:8.2f} ms  ({regular_ms / fast_ms:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
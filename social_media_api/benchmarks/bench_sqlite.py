@@ -0,0 +1,116 @@
+"""
+SQLite under a mixed load, with Django's defaults and with the pragmas of
+social_media_api/sqlite.py.
+
+    python -m benchmarks.bench_sqlite [seconds] [writers] [readers]
+
+For `seconds` (default 5), `writers` threads (default 4) like posts as the
+like view does, a read then an insert in one transaction, and `readers`
+threads (default 4) read a feed page. Prints the committed writes per
+second, the writes that failed with "database is locked", and the read
+latencies.
+"""
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+
+def modes():
+    from social_media_api.sqlite import sqlite_options
+
+    yield 'default', {}
+    yield 'tuned', sqlite_options()
+    yield 'tuned, synchronous=FULL', sqlite_options(synchronous='FULL')
+
+
+def write(user_ids, post_ids, deadline, seed):
+    from django.db import OperationalError, connection, transaction
+
+    from posts.models import Like
+
+    rng = random.Random(seed)
+    committed = locked = 0
+    while time.perf_counter() < deadline:
+        user_id, post_id = rng.choice(user_ids), rng.choice(post_ids)
+        try:
+            with transaction.atomic():
+                if not Like.objects.filter(user_id=user_id, post_id=post_id).exists():
+                    Like.objects.create(user_id=user_id, post_id=post_id)
+            committed += 1
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+    connection.close()
+    return committed, locked
+
+
+def read(user_ids, deadline, seed):
+    from django.db import connection
+    from django.db.models import Count
+
+    from posts.models import Post
+
+    rng = random.Random(seed)
+    latencies = []
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        authors = rng.sample(user_ids, 20)
+        list(Post.objects.filter(author_id__in=authors).annotate(likes=Count('like'))
+             .order_by('-created_at')[:20])
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    return latencies
+
+
+def main(seconds=5, writers=4, readers=4):
+    directory = tempfile.TemporaryDirectory()
+    database = f'{directory.name}/bench.sqlite3'
+    setup_django(database_name=database)
+
+    from django.db import DEFAULT_DB_ALIAS, connections
+
+    from benchmarks.graph import generate_graph
+    from benchmarks.loadtest import quantile
+
+    graph = generate_graph(users=500)
+    settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+    original = dict(settings_dict)
+    connections[DEFAULT_DB_ALIAS].close()
+
+    print(f'{writers} writers, {readers} readers, {seconds} s')
+    print(f"{'mode':<24}{'writes/s':>10}{'locked':>8}{'reads/s':>10}"
+          f"{'read p50 ms':>13}{'read p95 ms':>13}{'read p99 ms':>13}")
+    for name, options in modes():
+        settings_dict.clear()
+        settings_dict.update(original, OPTIONS=options)
+        # The journal mode is stored in the database file, set it (back) first
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={'WAL' if options else 'DELETE'}")
+        connections[DEFAULT_DB_ALIAS].close()
+
+        deadline = time.perf_counter() + seconds
+        with ThreadPoolExecutor(writers + readers) as executor:
+            writes = [executor.submit(write, graph.user_ids, graph.post_ids, deadline, seed)
+                      for seed in range(writers)]
+            reads = [executor.submit(read, graph.user_ids, deadline, seed) for seed in range(readers)]
+            committed = sum(future.result()[0] for future in writes)
+            locked = sum(future.result()[1] for future in writes)
+            latencies = sorted(latency for future in reads for latency in future.result())
+
+        p50, p95, p99 = (quantile(latencies, q) * 1000 for q in (0.5, 0.95, 0.99))
+        print(f'{name:<24}{committed / seconds:>10.0f}{locked:>8}{len(latencies) / seconds:>10.0f}'
+              f'{p50:>13.2f}{p95:>13.2f}{p99:>13.2f}')
+
+    settings_dict.clear()
+    settings_dict.update(original)
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,145 @@
+"""
+Synthetic social graph for the load tests.
+
+generate_graph() fills the database with `users` users whose numbers of
+followed accounts follow a power law (a few users follow thousands, most a
+handful), and who are followed by preferential attachment, so a few accounts
+collect most of the followers. Posts, comments, likes and notifications are
+spread the same way: popular authors post more and get most of the traffic.
+
+The same seed gives the same graph, so runs on different commits compare.
+"""
+import bisect
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+
+BATCH_SIZE = 2000
+LOREM = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. '
+
+
+class Graph:
+    """The ids generate_graph() created, for the scenarios to pick from."""
+
+    def __init__(self, user_ids, posts, following, likes, popularity):
+        self.user_ids = user_ids
+        self.post_ids = [pk for pk, _ in posts]
+        # author id -> post ids
+        self.posts_by = {}
+        for pk, author_id in posts:
+            self.posts_by.setdefault(author_id, []).append(pk)
+        # user id -> set of followed user ids
+        self.following = following
+        # (user id, post id) pairs that are already liked
+        self.likes = likes
+        self.cum_popularity = list(itertools.accumulate(popularity))
+
+    def popular_user(self, rng):
+        """A user id, drawn with the same skew as the followers."""
+        position = bisect.bisect(self.cum_popularity, rng.random() * self.cum_popularity[-1])
+        return self.user_ids[min(position, len(self.user_ids) - 1)]
+
+    def summary(self):
+        degrees = sorted((len(followed) for followed in self.following.values()), reverse=True)
+        return {
+            'users': len(self.user_ids),
+            'follows': sum(degrees),
+            'max_following': degrees[0] if degrees else 0,
+            'median_following': degrees[len(degrees) // 2] if degrees else 0,
+            'posts': len(self.post_ids),
+            'likes': len(self.likes),
+        }
+
+
+def power_law(rng, exponent, minimum, maximum):
+    """An integer in [minimum, maximum] with P(k) ~ k ** -exponent."""
+    return min(maximum, int(minimum * rng.paretovariate(exponent - 1)))
+
+
+def weighted_sample(rng, population, cum_weights, k, exclude):
+    """Up to k distinct items of population drawn by weight, none of them in exclude."""
+    chosen = set()
+    total = cum_weights[-1]
+    # Rejection sampling gives up quickly on the rare users who follow almost everybody
+    for _ in range(k * 4):
+        if len(chosen) == k:
+            break
+        item = population[min(bisect.bisect(cum_weights, rng.random() * total), len(population) - 1)]
+        if item not in exclude:
+            chosen.add(item)
+    return chosen
+
+
+def generate_graph(users=1000, posts_per_user=5, comments_per_post=2, likes_per_post=5,
+                   exponent=2.2, seed=0):
+    """Creates the graph in the default database and returns a Graph."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.contenttypes.models import ContentType
+
+    from notifications.models import Notification
+    from posts.models import Comment, Like, Post, path_segment
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    # Nobody logs in with a password; one unusable hash spares the hashing
+    password = make_password(None)
+
+    User.objects.bulk_create(
+        (User(username=f'user{i}', email=f'user{i}@example.com', password=password, bio='')
+         for i in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.filter(username__startswith='user').order_by('pk').values_list('pk', flat=True))
+
+    # How much each user attracts followers, likes and comments
+    popularity = [rng.paretovariate(exponent - 1) for _ in user_ids]
+    cum_popularity = list(itertools.accumulate(popularity))
+
+    following = {}
+    Follow = User.following.through
+    follows = []
+    for user_id in user_ids:
+        degree = power_law(rng, exponent, 1, len(user_ids) - 1)
+        followed = weighted_sample(rng, user_ids, cum_popularity, degree, {user_id})
+        following[user_id] = followed
+        follows.extend(Follow(from_customuser_id=user_id, to_customuser_id=other) for other in followed)
+    Follow.objects.bulk_create(follows, batch_size=BATCH_SIZE)
+
+    # Popular users post more
+    mean_popularity = cum_popularity[-1] / len(user_ids)
+    Post.objects.bulk_create(
+        (Post(author_id=user_id, title=f'Post {n} by user {user_id}', content=LOREM * rng.randint(1, 10))
+         for user_id, weight in zip(user_ids, popularity)
+         for n in range(max(1, round(posts_per_user * min(weight / mean_popularity, 20))))),
+        batch_size=BATCH_SIZE,
+    )
+    posts = list(Post.objects.order_by('pk').values_list('pk', 'author_id'))
+
+    popularity_of = dict(zip(user_ids, popularity))
+    comments, likes, notifications = [], set(), []
+    post_type = ContentType.objects.get_for_model(Post)
+    for pk, author_id in posts:
+        attention = min(popularity_of[author_id] / mean_popularity, 20)
+        for user_id in weighted_sample(rng, user_ids, cum_popularity, round(comments_per_post * attention), ()):
+            comments.append(Comment(post_id=pk, author_id=user_id, content=LOREM))
+            if user_id != author_id:
+                notifications.append(Notification(
+                    recipient_id=author_id, actor_id=user_id, verb='commented',
+                    target_content_type=post_type, target_object_id=pk))
+        for user_id in weighted_sample(rng, user_ids, cum_popularity, round(likes_per_post * attention), ()):
+            likes.add((user_id, pk))
+            if user_id != author_id:
+                notifications.append(Notification(
+                    recipient_id=author_id, actor_id=user_id, verb='liked',
+                    target_content_type=post_type, target_object_id=pk,
+                    is_read=rng.random() < 0.5))
+    Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+    # bulk_create() skips Comment.save(): every comment starts its own thread
+    for comment in comments:
+        comment.path = path_segment(comment.pk)
+    Comment.objects.bulk_update(comments, ['path'], batch_size=BATCH_SIZE)
+    Like.objects.bulk_create((Like(user_id=user_id, post_id=pk) for user_id, pk in likes), batch_size=BATCH_SIZE)
+    Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+
+    return Graph(user_ids, posts, following, likes, popularity)
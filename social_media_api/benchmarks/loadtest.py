@@ -0,0 +1,362 @@
+"""
+Load test of the API on a synthetic social graph (see benchmarks.graph).
+
+    python -m benchmarks.loadtest [--users 1000] [--requests 200] [--concurrency 8]
+                                  [--driver client|async|wsgi] [--scenario NAME ...]
+                                  [--json results.json] [--baseline previous.json]
+
+Each scenario sends --requests requests from --concurrency workers, as
+--active-users logged-in users:
+
+    feed_read          GET the feed
+    like_storm         like the posts of a few popular authors
+    follow_burst       follow popular users
+    notification_poll  GET the unread notifications
+
+Drivers:
+
+    client  Django test Client, one per worker thread (no network)
+    async   Django AsyncClient, through the ASGI handler, workers are tasks
+    wsgi    HTTP to a threaded WSGI server started on a free local port
+
+Prints a throughput/latency table per scenario. --json writes it with the
+commit, versions and options of the run; --baseline adds the change against
+such a file, e.g. one written on another commit.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks import setup_django
+
+Request = namedtuple('Request', 'method path user_id')
+
+QUANTILES = (0.5, 0.95, 0.99)
+HOT_AUTHORS = 5
+
+
+# Scenarios: each returns `count` requests, sent in order
+
+def feed_read(graph, active, rng, count):
+    return [Request('GET', '/api/posts/feed/', rng.choice(active)) for _ in range(count)]
+
+
+def like_storm(graph, active, rng, count):
+    hot_posts = [pk for _ in range(HOT_AUTHORS) for pk in graph.posts_by[graph.popular_user(rng)]]
+    requests = []
+    for _ in range(count * 4):
+        if len(requests) == count:
+            break
+        user_id, pk = rng.choice(active), rng.choice(hot_posts)
+        if (user_id, pk) not in graph.likes:
+            graph.likes.add((user_id, pk))
+            requests.append(Request('POST', f'/api/posts/posts/{pk}/like/', user_id))
+    return requests
+
+
+def follow_burst(graph, active, rng, count):
+    requests = []
+    for _ in range(count * 4):
+        if len(requests) == count:
+            break
+        user_id, other = rng.choice(active), graph.popular_user(rng)
+        if other != user_id and other not in graph.following[user_id]:
+            graph.following[user_id].add(other)
+            requests.append(Request('POST', f'/api/accounts/follow/{other}/', user_id))
+    return requests
+
+
+def notification_poll(graph, active, rng, count):
+    return [Request('GET', '/api/notifications/?unread=true', rng.choice(active)) for _ in range(count)]
+
+
+SCENARIOS = {
+    'feed_read': feed_read,
+    'like_storm': like_storm,
+    'follow_burst': follow_burst,
+    'notification_poll': notification_poll,
+}
+
+
+class Credentials:
+    """Session cookies and CSRF tokens of the active users."""
+
+    def __init__(self, user_ids):
+        from django.contrib.auth import get_user_model
+        from django.middleware.csrf import _get_new_csrf_string
+        from django.test import Client
+
+        self.headers = {}
+        for user in get_user_model().objects.filter(pk__in=user_ids):
+            client = Client()
+            client.force_login(user)
+            token = _get_new_csrf_string()
+            self.headers[user.pk] = {
+                'Cookie': f"sessionid={client.cookies['sessionid'].value}; csrftoken={token}",
+                'X-CSRFToken': token,
+            }
+
+
+def send_all(send, requests, concurrency):
+    """Sends the requests from `concurrency` threads; returns [(seconds, status)]."""
+    local = threading.local()
+
+    def timed(request):
+        start = time.perf_counter()
+        try:
+            status = send(local, request)
+        except Exception:
+            status = None
+        return time.perf_counter() - start, status
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(timed, requests))
+
+
+class ClientDriver:
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+    def send(self, local, request):
+        from django.test import Client
+
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        response = local.client.generic(
+            request.method, request.path, secure=True, headers=self.credentials.headers[request.user_id])
+        return response.status_code
+
+    def run(self, requests, concurrency):
+        return send_all(self.send, requests, concurrency)
+
+    def close(self):
+        pass
+
+
+class AsyncClientDriver:
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+    async def send_all(self, requests, concurrency):
+        from asgiref.sync import ThreadSensitiveContext
+        from django.test import AsyncClient
+
+        pending = iter(enumerate(requests))
+        results = [None] * len(requests)
+
+        async def worker():
+            client = AsyncClient()
+            for position, request in pending:
+                start = time.perf_counter()
+                try:
+                    # One per request, as in ASGIHandler
+                    async with ThreadSensitiveContext():
+                        response = await client.generic(
+                            request.method, request.path, secure=True,
+                            headers=self.credentials.headers[request.user_id])
+                    status = response.status_code
+                except Exception:
+                    status = None
+                results[position] = (time.perf_counter() - start, status)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results
+
+    def run(self, requests, concurrency):
+        return asyncio.run(self.send_all(requests, concurrency))
+
+    def close(self):
+        pass
+
+
+class WSGIDriver:
+    """Starts the project's WSGI application on a local port."""
+
+    def __init__(self, credentials):
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+        from django.core.wsgi import get_wsgi_application
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        self.credentials = credentials
+        self.server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+        self.server.set_app(get_wsgi_application())
+        self.host = f'127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def send(self, local, request):
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection(self.host, timeout=30)
+        headers = {
+            **self.credentials.headers[request.user_id],
+            # Behind the (absent) TLS proxy, see SECURE_PROXY_SSL_HEADER
+            'X-Forwarded-Proto': 'https',
+            'Referer': f'https://{self.host}/',
+            'Content-Length': '0',
+        }
+        try:
+            local.connection.request(request.method, request.path, headers=headers)
+            response = local.connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            local.connection.close()
+            raise
+        return response.status
+
+    def run(self, requests, concurrency):
+        return send_all(self.send, requests, concurrency)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+DRIVERS = {
+    'client': ClientDriver,
+    'async': AsyncClientDriver,
+    'wsgi': WSGIDriver,
+}
+
+
+def quantile(latencies, q):
+    return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+
+def summarize(results, seconds):
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status is None or status >= 400)
+    summary = {
+        'requests': len(results),
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'throughput': round(len(results) / seconds, 1) if seconds else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+    }
+    for q in QUANTILES:
+        summary[f'p{round(q * 100)}_ms'] = round(quantile(latencies, q) * 1000, 2) if latencies else 0.0
+    summary['max_ms'] = round(latencies[-1] * 1000, 2) if latencies else 0.0
+    return summary
+
+
+COLUMNS = ('requests', 'errors', 'throughput', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+# Larger is better for these, smaller for the others
+HIGHER_IS_BETTER = ('throughput',)
+
+
+def print_table(results, baseline=None):
+    print(f"{'scenario':<18}" + ''.join(f'{column:>12}' for column in COLUMNS))
+    for name, summary in results.items():
+        print(f'{name:<18}' + ''.join(f'{summary[column]:>12}' for column in COLUMNS))
+        previous = (baseline or {}).get(name)
+        if previous:
+            changes = []
+            for column in COLUMNS:
+                if column in ('requests', 'errors') or not previous.get(column):
+                    changes.append(f"{'':>12}")
+                else:
+                    change = (summary[column] - previous[column]) / previous[column] * 100
+                    changes.append(f'{change:>+11.1f}%')
+            print(f"{'  vs baseline':<18}" + ''.join(changes))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--active-users', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=200, help='per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--driver', choices=DRIVERS, default='client')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, dest='scenarios')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='FILE', help='write the results to FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare with the results in FILE')
+    options = parser.parse_args(argv)
+
+    # Worker threads need a database file they can all open
+    directory = tempfile.TemporaryDirectory()
+    setup_django(database_name=os.path.join(directory.name, 'loadtest.sqlite3'))
+
+    import django
+    from django.db import connection
+
+    from benchmarks.graph import generate_graph
+
+    start = time.perf_counter()
+    graph = generate_graph(users=options.users, seed=options.seed)
+    graph_summary = graph.summary()
+    print(f'graph: {graph_summary} ({time.perf_counter() - start:.1f} s)', file=sys.stderr)
+
+    rng = random.Random(options.seed)
+    active = rng.sample(graph.user_ids, min(options.active_users, len(graph.user_ids)))
+    driver = DRIVERS[options.driver](Credentials(active))
+    connection.close()
+
+    # Failed and slow requests are counted, not logged (after the WSGI
+    # application, whose django.setup() configures the logging again)
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    logging.getLogger('social_media_api.instrumentation').setLevel(logging.ERROR)
+
+    results = {}
+    try:
+        # Warm up imports, URL resolving and the database connections
+        driver.run(feed_read(graph, active, rng, options.concurrency * 2), options.concurrency)
+        for name in options.scenarios or SCENARIOS:
+            requests = SCENARIOS[name](graph, active, rng, options.requests)
+            start = time.perf_counter()
+            responses = driver.run(requests, options.concurrency)
+            results[name] = summarize(responses, time.perf_counter() - start)
+    finally:
+        driver.close()
+        connection.close()
+        directory.cleanup()
+
+    baseline = None
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)['results']
+    print_table(results, baseline)
+
+    if options.json:
+        report = {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'options': {key: value for key, value in vars(options).items() if key not in ('json', 'baseline')},
+            'graph': graph_summary,
+            'results': results,
+        }
+        with open(options.json, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
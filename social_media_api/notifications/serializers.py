@@ -1,8 +1,13 @@
 from rest_framework import serializers
 from .models import Notification
+from social_media_api.fieldsets import SparseFieldsetSerializerMixin
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    actor_username = serializers.ReadOnlyField(source='actor.username')
+    # returns 'post', 'comment', etc.
+    target_type = serializers.CharField(source='target_content_type.model', read_only=True, allow_null=True)
+
     class Meta:
         model = Notification
         fields = (
@@ -10,8 +15,3 @@ class NotificationSerializer(serializers.ModelSerializer):
             'target_type', 'target_object_id', 'is_read', 'timestamp'
         )
         read_only_fields = ('id', 'actor', 'timestamp', 'target_type')
-
-    def get_target_type(self, obj):
-        if obj.target_content_type:
-            return obj.target_content_type.model  # returns 'post', 'comment', etc.
-        return None
@@ -1,3 +1,30 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from posts.models import Post
+from .models import Notification
+
+User = get_user_model()
+
+
+class NotificationListTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author', password='password123')
+        self.actor = User.objects.create_user(username='fan', password='password123')
+        post = Post.objects.create(author=self.user, title='Hello', content='Body')
+        Notification.objects.create(recipient=self.user, actor=self.actor, verb='liked', target=post)
+        self.client.force_authenticate(self.user)
+
+    def test_list_notifications(self):
+        response = self.client.get(reverse('notification-list'), secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['actor_username'], 'fan')
+        self.assertEqual(response.data[0]['target_type'], 'post')
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('notification-list'), {'fields': 'id,verb'}, secure=True)
+
+        self.assertEqual(set(response.data[0]), {'id', 'verb'})
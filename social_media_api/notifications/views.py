@@ -4,12 +4,18 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Notification
 from .serializers import NotificationSerializer
+from social_media_api.fieldsets import SparseFieldsetMixin
+from social_media_api.replicas import ReplicaReadMixin
+from social_media_api.async_views import AsyncAPIViewMixin, AsyncListModelMixin
 
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationViewSet(ReplicaReadMixin, SparseFieldsetMixin, AsyncListModelMixin, AsyncAPIViewMixin,
+                          viewsets.ReadOnlyModelViewSet):
     """
     Provides list and retrieve for notifications.
     Standard list returns all; use ?unread=true to filter.
+    Use ?fields=id,verb or ?exclude=timestamp to get fewer fields.
+    The list (polled by clients) is async; the other actions run in a thread.
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
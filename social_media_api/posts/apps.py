@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        # Registers the signal handlers that drop cached hot posts
+        from . import caching  # noqa: F401
@@ -0,0 +1,29 @@
+"""
+Process-local cache of the hot posts' details (see social_media_api/hotkeys.py).
+
+A post retrieved HOT_POST_THRESHOLD times within one to two
+HOT_POST_WINDOW_SECONDS is served by PostViewSet.retrieve() from memory for
+HOT_POST_CACHE_SECONDS, and concurrent misses load it once. Saving or
+deleting a post drops it from the cache of the process; the others serve the
+old version until it expires.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from social_media_api.hotkeys import HotKeyCache
+
+from .models import Post
+
+hot_posts = HotKeyCache(
+    threshold=getattr(settings, 'HOT_POST_THRESHOLD', 50),
+    ttl=getattr(settings, 'HOT_POST_CACHE_SECONDS', 1),
+    window=getattr(settings, 'HOT_POST_WINDOW_SECONDS', 10),
+    size=getattr(settings, 'HOT_POST_CACHE_SIZE', 1000),
+)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    hot_posts.invalidate(instance.pk)
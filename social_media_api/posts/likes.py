@@ -0,0 +1,347 @@
+"""
+Write-behind likes, for posts going viral (LIKE_WRITE_BEHIND=true).
+
+The like and unlike views record the change in the process's LikeBuffer
+and answer at once. A background thread writes the buffered changes every
+LIKE_WRITE_BEHIND_FLUSH_MS in one transaction: one delete for the unlikes,
+and a bulk_create of the new likes and of their notifications. Changes to
+the same like are coalesced: a like undone before the flush writes nothing
+and notifies nobody.
+
+The like views see the buffered changes; the rest of the API only sees them
+once written, up to the flush interval later.
+
+Durability of an acknowledged change:
+
+- LIKE_WRITE_BEHIND_LOG_DIR empty: in memory only, the changes of the last
+  flush interval are lost if the process dies.
+- LIKE_WRITE_BEHIND_LOG_DIR (the default): each change is appended to a log
+  file of the process before the answer. It survives the process crashing,
+  not the machine (the file is in the OS page cache). The logs of a dead
+  process are replayed by the next process starting write-behind on the
+  same machine.
+- LIKE_WRITE_BEHIND_FSYNC as well: the log is fsynced before each answer,
+  so changes survive a power loss, at the cost of a disk flush per request
+  (blocking the event loop).
+
+Each flush starts a new log file, and removes the old one once committed.
+Replaying is idempotent for likes, but a crash between the commit and the
+removal notifies the authors of that flush twice.
+
+Every worker process has its own buffer, so a like and its unlike may be
+buffered by different workers. Like is unique per (user, post) and likes are
+inserted ignoring conflicts: a like flushed by two workers at once is stored
+once, though its author may be notified twice. The buffer is started with
+the server (see wsgi.py and asgi.py), which recovers the logs of dead
+processes right away.
+
+Likes of posts or by users deleted in the meantime are dropped when written.
+A flush failing MAX_ATTEMPTS times in a row gives up its changes, so that
+the later ones are written: their log is kept as likes-*.failed (recover()
+ignores it), or they are logged as lost without a log. recover() sets the
+log of a dead process aside the same way when its changes cannot be written.
+"""
+import atexit
+import functools
+import glob
+import json
+import logging
+import operator
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+
+from notifications.models import Notification
+
+from .models import Like, Post
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Likes per query, with two parameters each
+BATCH_SIZE = 400
+
+# Failed flushes of the same changes before giving them up
+MAX_ATTEMPTS = 3
+
+
+class LogFile:
+    """Append-only file of changes, locked for as long as its process uses it."""
+
+    def __init__(self, directory, fsync=False):
+        if fcntl is None:
+            raise ImproperlyConfigured('LIKE_WRITE_BEHIND_LOG_DIR needs file locks (fcntl), leave it empty here.')
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(prefix='likes-', suffix='.tmp', dir=directory)
+        self.file = os.fdopen(descriptor, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        # Only locked files are named *.log, see recover()
+        self.path = temporary[:-len('.tmp')] + '.log'
+        os.rename(temporary, self.path)
+        self.fsync = fsync
+
+    def append(self, change):
+        self.file.write(json.dumps(change) + '\n')
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def remove(self):
+        os.remove(self.path)
+        self.file.close()
+
+    def quarantine(self):
+        """Sets the file aside as *.failed, out of recover()'s reach; returns its new path."""
+        path = quarantine(self.path)
+        self.file.close()
+        return path
+
+
+def quarantine(path):
+    failed = path[:-len('.log')] + '.failed'
+    os.rename(path, failed)
+    return failed
+
+
+def read_log(file):
+    """The changes in a log file, {(user_id, post_id): (author_id, liked)}."""
+    changes = {}
+    for line in file:
+        try:
+            user_id, post_id, author_id, liked = json.loads(line)
+        except ValueError:
+            # The last line of a crashed process may be cut short
+            continue
+        changes[user_id, post_id] = (author_id, liked)
+    return changes
+
+
+def matching(pairs):
+    return functools.reduce(operator.or_, (Q(user_id=user_id, post_id=post_id) for user_id, post_id in pairs))
+
+
+def existing_ids(model, ids):
+    ids = list(ids)
+    existing = set()
+    for start in range(0, len(ids), BATCH_SIZE * 2):
+        existing.update(model.objects.filter(pk__in=ids[start:start + BATCH_SIZE * 2]).values_list('pk', flat=True))
+    return existing
+
+
+def write_changes(changes):
+    """
+    Writes {(user_id, post_id): (author_id, liked)} changes in one transaction;
+    returns the number of likes created.
+    """
+    liked = [pair for pair, (_, state) in changes.items() if state]
+    unliked = [pair for pair, (_, state) in changes.items() if not state]
+    with transaction.atomic():
+        for start in range(0, len(unliked), BATCH_SIZE):
+            Like.objects.filter(matching(unliked[start:start + BATCH_SIZE])).delete()
+
+        existing = set()
+        for start in range(0, len(liked), BATCH_SIZE):
+            existing.update(
+                Like.objects.filter(matching(liked[start:start + BATCH_SIZE])).values_list('user_id', 'post_id'))
+        created = [pair for pair in liked if pair not in existing]
+        # The post or the user may have been deleted since the like
+        posts = existing_ids(Post, {post_id for _, post_id in created})
+        users = existing_ids(get_user_model(), {user_id for user_id, _ in created})
+        created = [(user_id, post_id) for user_id, post_id in created if post_id in posts and user_id in users]
+        # Another worker may have flushed the same like since
+        Like.objects.bulk_create(
+            [Like(user_id=user_id, post_id=post_id) for user_id, post_id in created],
+            batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+        post_type = ContentType.objects.get_for_model(Post)
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=changes[user_id, post_id][0], actor_id=user_id, verb='liked',
+                target_content_type=post_type, target_object_id=post_id,
+            )
+            for user_id, post_id in created if changes[user_id, post_id][0] != user_id
+        ], batch_size=BATCH_SIZE)
+    return len(created)
+
+
+def modified_at(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        # Removed by its live process since the glob; open() skips it
+        return 0
+
+
+def recover(directory):
+    """Writes the changes logged by dead processes; returns their number."""
+    count = 0
+    for path in sorted(glob.glob(os.path.join(directory, 'likes-*.log')), key=modified_at):
+        try:
+            file = open(path)
+        except FileNotFoundError:
+            # A live process's, removed after its flush
+            continue
+        with file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # A live process's
+                continue
+            if not os.path.exists(path):
+                # Locked by its live process, then removed, in between
+                continue
+            changes = read_log(file)
+            if changes:
+                try:
+                    write_changes(changes)
+                except Exception:
+                    logger.exception('Writing the likes logged in %s failed, set aside as %s', path, quarantine(path))
+                    continue
+            os.remove(path)
+            count += len(changes)
+    if count:
+        logger.warning('Recovered %d buffered like changes from %s', count, directory)
+    return count
+
+
+class LikeBuffer:
+    """The buffered like changes of a process, see the module docstring."""
+
+    def __init__(self, log_dir=None, fsync=False, interval=0.005, max_attempts=MAX_ATTEMPTS):
+        self.log_dir = log_dir
+        self.fsync = fsync
+        self.interval = interval
+        self.max_attempts = max_attempts
+        # Failed flushes of the changes being written
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # {(user_id, post_id): (author_id, liked)}, recorded and being written
+        self.pending = {}
+        self.flushing = {}
+        self.log = LogFile(log_dir, fsync) if log_dir else None
+        self.flushing_log = None
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def state(self, user_id, post_id):
+        """Whether the buffer has the post liked by the user, None if it has no change for it."""
+        with self.lock:
+            change = self.pending.get((user_id, post_id)) or self.flushing.get((user_id, post_id))
+        return None if change is None else change[1]
+
+    def record(self, user_id, post_id, author_id, liked):
+        """Buffers a like (or an unlike); False if it is already the buffered state."""
+        with self.lock:
+            change = self.pending.get((user_id, post_id)) or self.flushing.get((user_id, post_id))
+            if change is not None and change[1] == liked:
+                return False
+            if self.log is not None:
+                self.log.append([user_id, post_id, author_id, liked])
+            self.pending[user_id, post_id] = (author_id, liked)
+        return True
+
+    def flush(self):
+        """Writes the buffered changes; returns the number of likes created."""
+        with self.flush_lock:
+            with self.lock:
+                # After a failed flush, the same changes are written again first
+                if not self.flushing:
+                    if not self.pending:
+                        return 0
+                    self.flushing, self.pending = self.pending, {}
+                    if self.log is not None:
+                        self.flushing_log, self.log = self.log, LogFile(self.log_dir, self.fsync)
+
+            try:
+                created = write_changes(self.flushing)
+            except Exception:
+                self.failures += 1
+                if self.failures >= self.max_attempts:
+                    self.give_up()
+                raise
+
+            self.failures = 0
+            with self.lock:
+                self.flushing = {}
+            if self.flushing_log is not None:
+                self.flushing_log.remove()
+                self.flushing_log = None
+            return created
+
+    def give_up(self):
+        """Drops the changes being written, keeping their log aside."""
+        if self.flushing_log is not None:
+            logger.error('Gave up writing %d like changes after %d attempts, logged in %s',
+                         len(self.flushing), self.failures, self.flushing_log.quarantine())
+            self.flushing_log = None
+        else:
+            logger.error('Gave up writing %d like changes after %d attempts, they are lost',
+                         len(self.flushing), self.failures)
+        self.failures = 0
+        with self.lock:
+            self.flushing = {}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='like-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def run(self):
+        if self.log_dir:
+            try:
+                recover(self.log_dir)
+            except Exception:
+                logger.exception('Recovering the buffered likes failed')
+        while not self.stopping.wait(self.interval):
+            if not self.pending and not self.flushing:
+                continue
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Writing the buffered likes failed')
+                connection.close()
+        connection.close()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+        self.flush()
+        if self.log is not None:
+            self.log.remove()
+            self.log = None
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_like_buffer():
+    """The process's LikeBuffer, started on first use; None unless LIKE_WRITE_BEHIND is set."""
+    global _buffer
+    if not getattr(settings, 'LIKE_WRITE_BEHIND', False):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = LikeBuffer(
+                    log_dir=getattr(settings, 'LIKE_WRITE_BEHIND_LOG_DIR', None),
+                    fsync=getattr(settings, 'LIKE_WRITE_BEHIND_FSYNC', False),
+                    interval=getattr(settings, 'LIKE_WRITE_BEHIND_FLUSH_MS', 5) / 1000,
+                )
+                buffer.start()
+                _buffer = buffer
+    return _buffer
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    # Keeps the first like of each (user, post)
+    Like = apps.get_model('posts', 'Like')
+    first = Like.objects.values('user', 'post').annotate(first=Min('pk')).values_list('first', flat=True)
+    Like.objects.exclude(pk__in=list(first)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_comment_threads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='posts_like_unique_user_post'),
+        ),
+    ]
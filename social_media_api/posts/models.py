@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 # Create your models here.
@@ -12,19 +12,57 @@ class Post(models.Model):
     def __str__(self):
         return self.title
 
+def path_segment(pk):
+    # Fixed width, so paths sort like the ids they are made of
+    return f'{pk:0{Comment.SEGMENT_WIDTH - 1}d}/'
+
+
 class Comment(models.Model):
+    # Replies nest at most this deep; a path holds MAX_DEPTH + 1 segments
+    MAX_DEPTH = 20
+    SEGMENT_WIDTH = 11
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
-    User = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
+    # Materialized path: the ids from the thread's first comment down to this
+    # one, e.g. '0000000012/0000000031/'. Ordering by path lists every reply
+    # right after its parent, threads in the order they were started
+    path = models.CharField(max_length=255, default='', editable=False)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created_at']),
+            models.Index(fields=['post', 'path']),
+        ]
+
     def __str__(self):
         return self.content
 
+    @property
+    def depth(self):
+        return len(self.path) // self.SEGMENT_WIDTH - 1
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            return super().save(*args, **kwargs)
+        # The path ends with the id of the new comment
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.path = (self.parent.path if self.parent_id else '') + path_segment(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 class Like(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='posts_like_unique_user_post'),
+        ]
+
     def __str__(self):
         return self.post
\ No newline at end of file
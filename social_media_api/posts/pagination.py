@@ -1,6 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 class StandardResultsPagination(PageNumberPagination):
     page_size = 10 # Number of times per page
     page_size_query_param = 'page_size' # Allow user to choose size (e.g. ?page_size=20)
 
+
+class CommentThreadPagination(CursorPagination):
+    # Threads in order, each reply right after its parent (see Comment.path)
+    ordering = 'path'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
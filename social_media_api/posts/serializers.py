@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Post
 from .models import Comment
+from social_media_api.fieldsets import SparseFieldsetSerializerMixin
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
 
     class Meta:
@@ -11,7 +12,28 @@ class PostSerializer(serializers.ModelSerializer):
 
 class CommentSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='author.username')
+    depth = serializers.ReadOnlyField()
 
     class Meta:
         model = Comment
-        field = ('post', 'user', 'content', 'created_at', 'updated_at')
+        fields = ('id', 'post', 'parent', 'depth', 'user', 'content', 'created_at', 'updated_at')
+
+    def validate(self, attrs):
+        # The post of the per-post endpoint comes from its URL
+        post = attrs.get('post', self.context.get('post'))
+        parent = attrs.get('parent')
+        if self.instance is not None:
+            # Moving a comment would move its replies out of their thread
+            if ('post' in attrs and post != self.instance.post) or (
+                    'parent' in attrs and parent != self.instance.parent):
+                raise serializers.ValidationError("A comment's post and parent cannot be changed.")
+        elif parent is not None:
+            if parent.post_id != post.pk:
+                raise serializers.ValidationError({'parent': 'Reply to a comment on the same post.'})
+            if parent.depth >= Comment.MAX_DEPTH:
+                raise serializers.ValidationError({'parent': f'Replies nest at most {Comment.MAX_DEPTH} deep.'})
+        return attrs
+
+
+class PostCommentSerializer(CommentSerializer):
+    post = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -1,3 +1,791 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections, router, transaction
+from django.db.models import Q
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from notifications.models import Notification
+from social_media_api.hotkeys import CountMinSketch
+from social_media_api.middleware import brotli
+from social_media_api.profiling import RequestProfile, Sampler, frame_name
+from social_media_api.renderers import FastJSONParser, FastJSONRenderer
+from social_media_api.singleflight import SingleFlight
+from social_media_api.sqlite import parse_pragmas, sqlite_options
+
+from .caching import hot_posts
+from .likes import LikeBuffer, recover
+from .models import Comment, Like, Post
+from .views import FeedAPIView, PostViewSet
+
+User = get_user_model()
+
+
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.author = User.objects.create_user(username='writer', password='password123')
+        self.user.following.add(self.author)
+        Post.objects.create(author=self.author, title='Hello', content='A long body of text')
+        self.client.force_authenticate(self.user)
+
+    def test_fields_param_limits_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post-list'), {'fields': 'title'}, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'title': 'Hello'}])
+        self.assertNotIn('"content"', queries[-1]['sql'])
+
+    def test_exclude_param_on_feed(self):
+        response = self.client.get(reverse('feed'), {'exclude': 'content,updated_at'}, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data[0]), {'author', 'title', 'created_at'})
+        self.assertEqual(response.data[0]['author'], 'writer')
+
+
+class FastPathTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        for i in range(3):
+            Post.objects.create(author=self.user, title=f'Post {i}', content='Body')
+        self.client.force_authenticate(self.user)
+
+    def test_fast_path_matches_serializer_output(self):
+        from social_media_api.fastpath import compile_serializer
+        from .serializers import PostSerializer
+
+        posts = Post.objects.order_by('id')
+        compiled = compile_serializer(PostSerializer())
+
+        self.assertIsNotNone(compiled)
+        self.assertEqual(
+            compiled.to_representation(compiled.values(posts)),
+            PostSerializer(posts, many=True).data,
+        )
+
+    def test_list_uses_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('post-list'), secure=True)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response.data[0]['author'], 'reader')
+
+    def test_own_to_representation_is_not_compiled(self):
+        from social_media_api.fastpath import compile_serializer
+        from .serializers import PostSerializer
+
+        class UpperTitleSerializer(PostSerializer):
+            def to_representation(self, instance):
+                data = super().to_representation(instance)
+                data['title'] = data['title'].upper()
+                return data
+
+        self.assertIsNone(compile_serializer(UpperTitleSerializer()))
+
+    def test_compiled_fields_are_the_request_serializers(self):
+        from social_media_api.fastpath import _plans, compile_serializer
+        from .serializers import PostSerializer
+
+        compile_serializer(PostSerializer(context={'view': 'first'}))
+        serializer = PostSerializer(context={'view': 'second'})
+        compiled = compile_serializer(serializer)
+
+        self.assertTrue(all(field.parent is serializer for field in compiled.fields if field is not None))
+        # Only names, sources and flags are kept across requests
+        for plan in filter(None, _plans.values()):
+            self.assertTrue(all(isinstance(part, (str, bool)) for column in plan for part in column))
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {
+        'decimal': Decimal('12.50'),
+        'aware': datetime.datetime(2026, 10, 19, 10, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'naive': datetime.datetime(2026, 10, 19, 10, 30, 15, 123456),
+        'offset': datetime.datetime(2026, 10, 19, 10, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+        'date': datetime.date(2026, 10, 19),
+        'time': datetime.time(10, 30, 15, 123456),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('This field is required.'),
+        'text': 'caf\u00e9 \u2028 </script>',
+        'big': 2 ** 70,
+        'nested': [{1: (1, 2)}],
+        'float': [0.1, -2.5, 1e15, 123456789.123, 0.0001, 5e-324],
+    }
+    # Written differently from JSONRenderer, see social_media_api/renderers.py
+    exponents = [1e16, 1e-05, 1e-07, 1.5e300, 1.2345678901234568e16, Decimal('1E+20'), Decimal('0.0000001')]
+
+    def test_output_matches_json_renderer(self):
+        for key, value in self.data.items():
+            with self.subTest(key=key):
+                self.assertEqual(FastJSONRenderer().render({key: value}), JSONRenderer().render({key: value}))
+
+    def test_exponents_have_the_same_values(self):
+        import json
+
+        for value in self.exponents:
+            with self.subTest(value=value):
+                self.assertEqual(json.loads(FastJSONRenderer().render([value])),
+                                 json.loads(JSONRenderer().render([value])))
+
+    def test_parser_round_trip(self):
+        from io import BytesIO
+
+        body = FastJSONRenderer().render(self.data)
+
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+
+    def test_without_orjson(self):
+        from io import BytesIO
+
+        with mock.patch('social_media_api.renderers.orjson', None):
+            body = FastJSONRenderer().render(self.data)
+            self.assertEqual(body, JSONRenderer().render(self.data))
+            self.assertEqual(FastJSONParser().parse(BytesIO(body))['uuid'], str(self.data['uuid']))
+
+    def test_invalid_json_is_a_parse_error(self):
+        from io import BytesIO
+
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"title": '))
+
+
+class CompressionTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        for i in range(50):
+            Post.objects.create(author=self.user, title=f'Post {i}', content='Lorem ipsum dolor sit amet. ' * 5)
+        self.client.force_authenticate(self.user)
+
+    def test_large_json_is_gzipped(self):
+        import gzip
+        import json
+
+        response = self.client.get(reverse('post-list'), secure=True, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 50)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli_length_is_randomized(self):
+        import json
+
+        # BREACH: the same body compresses to a different length each time
+        lengths = set()
+        for _ in range(10):
+            response = self.client.get(reverse('post-list'), secure=True, HTTP_ACCEPT_ENCODING='br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(len(json.loads(brotli.decompress(response.content))), 50)
+            lengths.add(len(response.content))
+
+        self.assertGreater(len(lengths), 1)
+
+    def test_small_json_is_not_compressed(self):
+        response = self.client.get(reverse('post-list'), {'fields': 'title', 'search': 'Post 1'},
+                                   secure=True, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class InstrumentationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        for i in range(3):
+            Post.objects.create(author=self.user, title=f'Post {i}', content='Lorem ipsum')
+        self.client.force_authenticate(self.user)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_record_views(self):
+        self.client.get(reverse('post-list'), secure=True)
+
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('django_view_request_seconds_count{view="post-list"}', body)
+        self.assertIn('django_view_request_quantile_seconds{view="post-list",quantile="0.99"}', body)
+        self.assertIn('django_view_queries_total{view="post-list"}', body)
+        self.assertNotIn('view="metrics"', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_need_the_token(self):
+        # Through a reverse proxy on the same host, any client comes from 127.0.0.1
+        proxied = {'REMOTE_ADDR': '127.0.0.1', 'HTTP_X_FORWARDED_FOR': '203.0.113.5'}
+
+        self.assertEqual(self.client.get('/metrics/', **proxied).status_code, 404)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer guess', **proxied).status_code, 404)
+
+    def test_metrics_are_disabled_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    def test_slow_request_is_logged_as_json(self):
+        import json
+
+        with self.settings(INSTRUMENTATION_SLOW_REQUEST_MS=0), \
+                self.assertLogs('social_media_api.instrumentation', 'WARNING') as logs:
+            # The middleware reads the setting when it is instantiated
+            self.client.handler.load_middleware()
+            self.client.get(reverse('post-list'), secure=True)
+        self.client.handler.load_middleware()
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'post-list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+
+
+class ProfilingTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        Post.objects.create(author=self.user, title='Post', content='Lorem ipsum')
+        self.client.force_authenticate(self.user)
+        self.output_dir = tempfile.mkdtemp()
+
+    def get_posts(self, **headers):
+        original_list = PostViewSet.list
+
+        def slow_list(view, request, *args, **kwargs):
+            time.sleep(0.05)
+            return original_list(view, request, *args, **kwargs)
+
+        settings = {'PROFILING_TOKEN': 'secret', 'PROFILING_INTERVAL_MS': 1, 'PROFILING_OUTPUT_DIR': self.output_dir}
+        with self.settings(**settings), mock.patch.object(PostViewSet, 'list', slow_list):
+            self.client.handler.load_middleware()
+            response = self.client.get(reverse('post-list'), secure=True, **headers)
+        self.client.handler.load_middleware()
+        return response
+
+    def test_header_triggers_profile(self):
+        response = self.get_posts(HTTP_X_PROFILE='secret')
+
+        self.assertGreater(int(response['X-Profile-Samples']), 0)
+        with open(os.path.join(self.output_dir, 'post-list.collapsed')) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any('slow_list' in line for line in lines))
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertTrue(stack and int(count) > 0)
+
+    def test_wrong_token_is_ignored(self):
+        response = self.get_posts(HTTP_X_PROFILE='guess')
+
+        self.assertFalse(response.has_header('X-Profile-Samples'))
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+    async def test_async_view_is_profiled_under_asgi(self):
+        original_initial = FeedAPIView.initial
+
+        def slow_initial(view, request, *args, **kwargs):
+            time.sleep(0.05)
+            return original_initial(view, request, *args, **kwargs)
+
+        await self.async_client.aforce_login(self.user)
+        settings = {'PROFILING_TOKEN': 'secret', 'PROFILING_INTERVAL_MS': 1, 'PROFILING_OUTPUT_DIR': self.output_dir}
+        with self.settings(**settings), mock.patch.object(FeedAPIView, 'initial', slow_initial):
+            self.async_client.handler.load_middleware(is_async=True)
+            response = await self.async_client.get(reverse('feed'), secure=True, headers={'X-Profile': 'secret'})
+        self.async_client.handler.load_middleware(is_async=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Profile-Samples']), 0)
+        with open(os.path.join(self.output_dir, 'feed.collapsed')) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any('slow_initial' in line for line in lines))
+
+    def test_frame_name_without_qualname(self):
+        # Python before 3.11
+        code = mock.Mock(spec=['co_name'], co_name='list')
+        frame = mock.Mock(f_code=code, f_globals={'__name__': 'posts.views'})
+
+        self.assertEqual(frame_name(frame), 'posts.views:list')
+
+    def test_stacks_are_formatted_without_the_lock(self):
+        sampler = Sampler(0.001, None)
+        profile = RequestProfile(True, time.perf_counter())
+        locked = []
+
+        def collapse(frame):
+            locked.append(sampler.lock.locked())
+            return 'stack'
+
+        with mock.patch('social_media_api.profiling.collapse', collapse):
+            sampler.register(threading.get_ident(), profile)
+            deadline = time.perf_counter() + 5
+            while not profile.stacks and time.perf_counter() < deadline:
+                time.sleep(0.001)
+            sampler.unregister(threading.get_ident())
+
+        self.assertGreater(profile.stacks['stack'], 0)
+        self.assertNotIn(True, locked)
+
+
+# Not in a TestCase transaction, which would keep all reads on the primary
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(APITransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.post = Post.objects.create(author=self.user, title='Post', content='Lorem ipsum')
+        self.client.force_authenticate(self.user)
+
+    def read_database_of_feed(self):
+        """The database the feed would read from (no replica database exists here)."""
+        databases = []
+
+        async def list_view(view, request, *args, **kwargs):
+            databases.append(router.db_for_read(Post))
+            return Response([])
+
+        with mock.patch.object(FeedAPIView, 'list', list_view):
+            self.client.get(reverse('feed'), secure=True)
+        return databases[0]
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.read_database_of_feed(), 'replica')
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.post(f'/api/posts/posts/{self.post.pk}/like/', secure=True)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('db_pin', response.cookies)
+        self.assertEqual(self.read_database_of_feed(), 'default')
+
+        cache.delete(f'replicas:pin:{self.user.pk}')
+        self.client.cookies.pop('db_pin')
+        self.assertEqual(self.read_database_of_feed(), 'replica')
+
+    def test_write_pins_user_without_cookies(self):
+        # A token client, which drops the cookie
+        response = self.client.post(f'/api/posts/posts/{self.post.pk}/like/', secure=True)
+        self.assertEqual(response.status_code, 201)
+        self.client.cookies.clear()
+
+        self.assertEqual(self.read_database_of_feed(), 'default')
+
+        # Other users still read from the replica
+        self.client.force_authenticate(User.objects.create_user(username='other', password='password123'))
+        self.assertEqual(self.read_database_of_feed(), 'replica')
+
+    def test_user_pin_expires(self):
+        with override_settings(REPLICA_PIN_SECONDS=0.1):
+            self.client.post(f'/api/posts/posts/{self.post.pk}/like/', secure=True)
+        self.client.cookies.clear()
+
+        time.sleep(0.2)
+
+        self.assertEqual(self.read_database_of_feed(), 'replica')
+
+    def test_writes_and_transactions_use_primary(self):
+        from social_media_api.replicas import replica_reads
+
+        self.post._state.db = 'replica'
+        self.assertEqual(router.db_for_write(Post, instance=self.post), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Post), 'default')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class SQLiteTuningTests(SimpleTestCase):
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {
+                **connection.settings_dict,
+                'NAME': os.path.join(directory, 'tuned.sqlite3'),
+                'OPTIONS': sqlite_options(**parse_pragmas('synchronous=FULL,mmap_size=0')),
+            }
+            tuned = type(connections['default'])(settings_dict, alias='tuned')
+            try:
+                with tuned.cursor() as cursor:
+                    pragmas = {
+                        name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'temp_store')
+                    }
+            finally:
+                tuned.close()
+
+        self.assertEqual(pragmas, {
+            'busy_timeout': 5000, 'journal_mode': 'wal', 'synchronous': 2, 'mmap_size': 0, 'temp_store': 2,
+        })
+        self.assertEqual(tuned.transaction_mode, 'IMMEDIATE')
+
+    def test_pragmas_can_be_left_out(self):
+        options = sqlite_options(mmap_size=None)
+
+        self.assertNotIn('mmap_size', options['init_command'])
+
+    def test_invalid_pragmas(self):
+        with self.assertRaises(ImproperlyConfigured):
+            parse_pragmas('synchronous')
+        with self.assertRaises(ImproperlyConfigured):
+            sqlite_options(synchronous='OFF; DROP TABLE posts_post')
+
+
+class AsyncViewTests(APITestCase):
+    """The async views, through the ASGI handler."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.author = User.objects.create_user(username='writer', password='password123')
+        self.user.following.add(self.author)
+        self.post = Post.objects.create(author=self.author, title='Hello', content='Lorem ipsum')
+
+    def test_views_are_async(self):
+        from asgiref.sync import iscoroutinefunction
+
+        self.assertTrue(FeedAPIView.view_is_async)
+        self.assertTrue(iscoroutinefunction(FeedAPIView.as_view()))
+
+    async def test_feed(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('feed'), {'fields': 'title,author'}, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'author': 'writer', 'title': 'Hello'}])
+
+    async def test_feed_requires_authentication(self):
+        response = await self.async_client.get(reverse('feed'), secure=True)
+
+        self.assertEqual(response.status_code, 403)
+
+    async def test_like_unlike_and_notifications(self):
+        await self.async_client.aforce_login(self.user)
+        like_url = f'/api/posts/posts/{self.post.pk}/like/'
+
+        response = await self.async_client.post(like_url, secure=True)
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.post(like_url, secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(await Like.objects.acount(), 1)
+
+        await self.async_client.aforce_login(self.author)
+        response = await self.async_client.get('/api/notifications/', {'unread': 'true'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(n['actor_username'], n['verb']) for n in response.json()], [('reader', 'liked')])
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(f'/api/posts/posts/{self.post.pk}/unlike/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await Like.objects.aexists())
+        self.assertEqual(await Notification.objects.acount(), 1)
+
+    async def test_missing_post(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.post('/api/posts/posts/999/like/', secure=True)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class WriteBehindLikeTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.author = User.objects.create_user(username='writer', password='password123')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='Lorem ipsum')
+        self.client.force_authenticate(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_dir = directory.name
+        # Not started: the tests flush
+        self.buffer = LikeBuffer(log_dir=self.log_dir)
+        self.addCleanup(lambda: self.buffer.log.file.close())
+        patcher = mock.patch('posts.views.get_like_buffer', return_value=self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def like(self, action='like'):
+        return self.client.post(f'/api/posts/posts/{self.post.pk}/{action}/', secure=True)
+
+    def test_likes_are_written_in_batches(self):
+        self.assertEqual(self.like().status_code, 201)
+        self.assertEqual(self.like().status_code, 400)
+        self.assertFalse(Like.objects.exists())
+
+        with self.assertNumQueries(7):
+            self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.actor, notification.target),
+                         (self.author, self.user, self.post))
+        self.assertEqual(self.like().status_code, 400)
+
+    def test_changes_are_coalesced(self):
+        self.assertEqual(self.like().status_code, 201)
+        self.assertEqual(self.like('unlike').status_code, 200)
+
+        self.buffer.flush()
+
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_unlike_written_like(self):
+        Like.objects.create(user=self.user, post=self.post)
+
+        self.assertEqual(self.like('unlike').status_code, 200)
+        self.buffer.flush()
+
+        self.assertFalse(Like.objects.exists())
+
+    def test_recovery_from_log(self):
+        self.assertEqual(self.like().status_code, 201)
+        # The process dies: its log is no longer locked
+        self.buffer.log.file.close()
+
+        with self.assertLogs('posts.likes', 'WARNING'):
+            self.assertEqual(recover(self.log_dir), 1)
+
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(os.listdir(self.log_dir), [])
+
+    def test_live_logs_are_not_recovered(self):
+        self.assertEqual(self.like().status_code, 201)
+
+        self.assertEqual(recover(self.log_dir), 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_likes_of_deleted_posts_are_dropped(self):
+        other = Post.objects.create(author=self.author, title='Other', content='Lorem ipsum')
+        self.assertEqual(self.like().status_code, 201)
+        self.assertEqual(self.client.post(f'/api/posts/posts/{other.pk}/like/', secure=True).status_code, 201)
+        self.post.delete()
+
+        self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertEqual(list(Like.objects.values_list('post_id', flat=True)), [other.pk])
+        self.assertEqual(os.listdir(self.log_dir), [os.path.basename(self.buffer.log.path)])
+
+    def test_failing_changes_are_given_up(self):
+        self.assertEqual(self.like().status_code, 201)
+        failing = mock.patch('posts.likes.write_changes', side_effect=RuntimeError('database down'))
+
+        with failing, self.assertLogs('posts.likes', 'ERROR'):
+            for _ in range(self.buffer.max_attempts):
+                with self.assertRaises(RuntimeError):
+                    self.buffer.flush()
+
+        # The later likes are written, the failed ones are kept aside
+        self.assertEqual(self.buffer.state(self.user.pk, self.post.pk), None)
+        self.assertEqual(self.like().status_code, 201)
+        self.assertEqual(self.buffer.flush(), 1)
+        failed = [name for name in os.listdir(self.log_dir) if name.endswith('.failed')]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(recover(self.log_dir), 0)
+
+    def test_failing_log_is_set_aside(self):
+        self.assertEqual(self.like().status_code, 201)
+        self.buffer.log.file.close()
+
+        with mock.patch('posts.likes.write_changes', side_effect=RuntimeError('database down')), \
+                self.assertLogs('posts.likes', 'ERROR'):
+            self.assertEqual(recover(self.log_dir), 0)
+
+        self.assertEqual([name.rsplit('.', 1)[1] for name in os.listdir(self.log_dir)], ['failed'])
+
+    def test_logs_removed_during_recovery_are_skipped(self):
+        self.assertEqual(self.like().status_code, 201)
+        self.buffer.log.file.close()
+        # A live process's log, removed after its flush
+        gone = os.path.join(self.log_dir, 'likes-gone.log')
+
+        with mock.patch('glob.glob', return_value=[gone, self.buffer.log.path]), \
+                self.assertLogs('posts.likes', 'WARNING'):
+            self.assertEqual(recover(self.log_dir), 1)
+
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+
+    def test_like_flushed_by_another_worker(self):
+        self.assertEqual(self.like().status_code, 201)
+        # Written by another worker after this flush looked for it
+        Like.objects.create(user=self.user, post=self.post)
+
+        with mock.patch('posts.likes.matching', return_value=Q(pk__in=[])):
+            self.buffer.flush()
+
+        self.assertEqual(Like.objects.filter(user=self.user, post=self.post).count(), 1)
+
+
+class HotPostTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.post = Post.objects.create(author=self.user, title='Hello', content='Lorem ipsum')
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch.object(hot_posts, 'threshold', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        hot_posts.clear()
+        self.addCleanup(hot_posts.clear)
+
+    def get(self, **params):
+        return self.client.get(reverse('post-detail', args=[self.post.pk]), params, secure=True)
+
+    def test_hot_post_is_served_from_memory(self):
+        self.assertEqual(self.get().json()['title'], 'Hello')
+        self.get()
+
+        with self.assertNumQueries(0):
+            response = self.get(fields='title,author')
+
+        self.assertEqual(response.json(), {'title': 'Hello', 'author': 'reader'})
+
+    def test_saved_post_is_dropped(self):
+        self.get()
+        self.get()
+        self.post.title = 'Edited'
+        self.post.save()
+
+        self.assertEqual(self.get().json()['title'], 'Edited')
+
+    def test_missing_post(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('post-detail', args=[999]), secure=True).status_code, 404)
+
+    def test_concurrent_calls_run_once(self):
+        import threading
+
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'post'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do(1, load)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do(1, load))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        # The followers are waiting on the leader's call
+        while len(flight.calls[1].done._cond._waiters) < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ['post'] * 5)
+
+    def test_count_min_sketch_never_undercounts(self):
+        sketch = CountMinSketch(width=16, depth=3)
+        for key in range(100):
+            for _ in range(key % 7):
+                sketch.add(key)
+
+        for key in range(100):
+            self.assertGreaterEqual(sketch.estimate(key), key % 7)
+
+
+class CommentThreadTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.post = Post.objects.create(author=self.user, title='Hello', content='Lorem ipsum')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('post-comments', args=[self.post.pk])
+
+    def comment(self, content, parent=None):
+        return Comment.objects.create(post=self.post, author=self.user, content=content, parent=parent)
+
+    def test_replies_follow_their_parent(self):
+        first = self.comment('first')
+        second = self.comment('second')
+        reply = self.comment('reply', parent=first)
+        self.comment('nested', parent=reply)
+        self.comment('second reply', parent=second)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, secure=True)
+
+        results = response.json()['results']
+        self.assertEqual(
+            [(comment['content'], comment['depth']) for comment in results],
+            [('first', 0), ('reply', 1), ('nested', 2), ('second', 0), ('second reply', 1)])
+        self.assertEqual(results[1]['parent'], first.pk)
+
+    def test_cursor_pages(self):
+        for index in range(5):
+            self.comment(f'comment {index}')
+
+        page = self.client.get(self.url, {'page_size': 2}, secure=True).json()
+        contents = [comment['content'] for comment in page['results']]
+        while page['next']:
+            with self.assertNumQueries(1):
+                page = self.client.get(page['next'], secure=True).json()
+            contents += [comment['content'] for comment in page['results']]
+
+        self.assertEqual(contents, [f'comment {index}' for index in range(5)])
+
+    def test_newest_first(self):
+        first = self.comment('first')
+        self.comment('reply', parent=first)
+
+        response = self.client.get(self.url, {'ordering': '-created_at'}, secure=True)
+
+        self.assertEqual([comment['content'] for comment in response.json()['results']], ['reply', 'first'])
+
+    def test_reply(self):
+        parent = self.comment('first')
+
+        response = self.client.post(self.url, {'content': 'reply', 'parent': parent.pk}, secure=True)
+
+        self.assertEqual(response.status_code, 201)
+        reply = Comment.objects.get(pk=response.json()['id'])
+        self.assertEqual((reply.post, reply.author, reply.depth), (self.post, self.user, 1))
+        self.assertTrue(reply.path.startswith(parent.path))
+
+    def test_reply_to_another_post(self):
+        other = Post.objects.create(author=self.user, title='Other', content='Lorem ipsum')
+        parent = Comment.objects.create(post=other, author=self.user, content='elsewhere')
+
+        response = self.client.post(self.url, {'content': 'reply', 'parent': parent.pk}, secure=True)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_missing_post(self):
+        url = reverse('post-comments', args=[999])
+
+        self.assertEqual(self.client.get(url, secure=True).status_code, 404)
+        self.assertEqual(self.client.post(url, {'content': 'lost'}, secure=True).status_code, 404)
+
+    def test_comment_list(self):
+        self.comment('first')
+
+        response = self.client.get(reverse('comment-list'), secure=True)
+
+        self.assertEqual([comment['content'] for comment in response.json()['results']], ['first'])
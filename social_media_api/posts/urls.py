@@ -2,7 +2,7 @@ from django.urls import path
 from django.urls import include
 from rest_framework.routers import DefaultRouter
 
-from .views import CommentViewSet, FeedAPIView
+from .views import CommentViewSet, FeedAPIView, PostCommentsView
 from .views import PostViewSet
 from .views import UnlikePostView
 from .views import LikePostView
@@ -13,7 +13,8 @@ router.register(r'comments', CommentViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('feed/', FeedAPIView.as_view()),
+    path('feed/', FeedAPIView.as_view(), name='feed'),
+    path('posts/<int:pk>/comments/', PostCommentsView.as_view(), name='post-comments'),
     path('posts/<int:pk>/unlike/', UnlikePostView.as_view()),
     path('posts/<int:pk>/like/', LikePostView.as_view())
 ]
\ No newline at end of file
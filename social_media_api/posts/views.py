@@ -3,22 +3,29 @@ from rest_framework import permissions
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.shortcuts import aget_object_or_404, get_object_or_404
 
 from .permissions import IsAuthorOrReadOnly
 from .models import Post, Like
 from .models import Comment
 from .serializers import PostSerializer
-from .serializers import CommentSerializer
+from .serializers import CommentSerializer, PostCommentSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter
 from rest_framework.filters import OrderingFilter
-from .pagination import StandardResultsPagination
+from .pagination import CommentThreadPagination, StandardResultsPagination
+from .likes import get_like_buffer
+from .caching import hot_posts
 
 from  notifications.models import Notification
+from social_media_api.fieldsets import SparseFieldsetMixin, select_fields
+from social_media_api.fastpath import FastPathListMixin
+from social_media_api.replicas import ReplicaReadMixin
+from social_media_api.async_views import AsyncAPIViewMixin, AsyncListModelMixin
 
 
 # Create your views here.
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ReplicaReadMixin, SparseFieldsetMixin, FastPathListMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
@@ -32,75 +39,150 @@ class PostViewSet(viewsets.ModelViewSet):
         # Automatically attach the logged-in user as the user
         serializer.save(author=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        # Hot posts are cached for everyone alike: not with filters or ordering
+        if not pk.isdigit() or set(request.query_params) - {'fields', 'exclude'}:
+            return super().retrieve(request, *args, **kwargs)
+
+        post, data = hot_posts.get(int(pk), lambda: self.load_detail(int(pk)))
+        self.check_object_permissions(request, post)
+        return Response(select_fields(data, request))
+
+    def load_detail(self, pk):
+        """The post and all the fields of its detail, see posts/caching.py."""
+        post = get_object_or_404(Post.objects.select_related('author'), pk=pk)
+        return post, self.get_serializer_class()(post).data
+
 class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('author').order_by('-created_at')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
-    pagination_class = [StandardResultsPagination]
+    pagination_class = StandardResultsPagination
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
-class FeedAPIView(generics.GenericAPIView):
+class PostCommentsView(ReplicaReadMixin, generics.ListCreateAPIView):
+    """
+    The comments of a post, a page in one query: thread by thread with each
+    reply right after its parent (?ordering=path, the default), or the newest
+    first (?ordering=-created_at). POST adds a comment, or a reply to `parent`.
+    """
+    serializer_class = PostCommentSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CommentThreadPagination
+    # The cursor pagination orders by the ordering filter
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['path', 'created_at']
+    ordering = 'path'
+
+    def get_queryset(self):
+        return Comment.objects.filter(post_id=self.kwargs['pk']).select_related('author')
+
+    def get_post(self):
+        if not hasattr(self, '_post'):
+            self._post = get_object_or_404(Post, pk=self.kwargs['pk'])
+        return self._post
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'POST':
+            context['post'] = self.get_post()
+        return context
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # Only an empty page needs the post looked up
+        if not response.data['results']:
+            self.get_post()
+        return response
+
+    def perform_create(self, serializer):
+        serializer.save(post=self.get_post(), author=self.request.user)
+
+
+class FeedAPIView(ReplicaReadMixin, SparseFieldsetMixin, AsyncListModelMixin, FastPathListMixin,
+                  AsyncAPIViewMixin, generics.GenericAPIView):
+    serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    def get_queryset(self):
         # Get the list of user the current user is following
-        following_users = request.user.following.all()
+        following_users = self.request.user.following.all()
 
         # Filter post where the author is in the list
-        posts = Post.objects.filter(author__in=following_users).order_by('-created_at')
+        return Post.objects.filter(author__in=following_users).order_by('-created_at')
+
+    async def get(self, request, *args, **kwargs):
+        return await self.list(request, *args, **kwargs)
+
 
-        # serialize the data
-        serializer = PostSerializer(posts, many=True)
+async def notify_liked(post, user):
+    """Tells the author of `post` that `user` liked it."""
+    if post.author_id != user.pk:
+        await Notification.objects.acreate(
+            recipient_id=post.author_id,
+            actor=user,
+            verb="liked",
+            target=post,
+        )
 
-        return Response(serializer.data)
 
+async def is_liked(buffer, user, post):
+    """Whether `user` likes `post`, buffered changes included (see posts/likes.py)."""
+    state = buffer.state(user.pk, post.pk)
+    if state is None:
+        state = await Like.objects.filter(user=user, post=post).aexists()
+    return state
 
-class LikePostView(generics.GenericAPIView):
+
+class LikePostView(AsyncAPIViewMixin, generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
     # 1. Ensure 'post' is lowercase
-    def post(self, request, pk):
-        post = generics.get_object_or_404(Post, pk=pk)
+    async def post(self, request, pk):
+        post = await aget_object_or_404(Post, pk=pk)
+
+        buffer = get_like_buffer()
+        if buffer is not None:
+            if await is_liked(buffer, request.user, post) or not buffer.record(
+                    request.user.pk, post.pk, post.author_id, True):
+                return Response({'error': 'you already liked this post'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response('Post has been liked', status=status.HTTP_201_CREATED)
 
-        # 2. Use 'request.user' directly to satisfy the checker string search
-        like_obj, created = Like.objects.get_or_create(user=request.user, post=post)
+        # 2. Use 'request.user' directly
+        like_obj, created = await Like.objects.aget_or_create(user=request.user, post=post)
 
         if not created:
             return Response({'error': 'you already liked this post'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
-                verb="liked",
-                target=post,
-            )
+        await notify_liked(post, request.user)
 
         return Response('Post has been liked', status=status.HTTP_201_CREATED)
 
 
-class UnlikePostView(generics.GenericAPIView):
+class UnlikePostView(AsyncAPIViewMixin, generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, pk):
-        post = generics.get_object_or_404(Post, pk=pk)
+    async def post(self, request, pk):
+        post = await aget_object_or_404(Post, pk=pk)
+
+        buffer = get_like_buffer()
+        if buffer is not None:
+            if await is_liked(buffer, request.user, post):
+                buffer.record(request.user.pk, post.pk, post.author_id, False)
+                return Response('Post has been unliked', status=status.HTTP_200_OK)
+            buffer.record(request.user.pk, post.pk, post.author_id, True)
+            return Response('Post has been liked', status=status.HTTP_201_CREATED)
 
-        # 3. Checker string search match
-        like_obj, created = Like.objects.get_or_create(user=request.user, post=post)
+        like_obj, created = await Like.objects.aget_or_create(user=request.user, post=post)
 
         if not created:
-            like_obj.delete()
+            await like_obj.adelete()
             return Response('Post has been unliked', status=status.HTTP_200_OK)
 
         # If created is True, they just liked it via the Unlike endpoint
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
-                verb="liked",
-                target=post,
-            )
+        await notify_liked(post, request.user)
         return Response('Post has been liked', status=status.HTTP_201_CREATED)
\ No newline at end of file
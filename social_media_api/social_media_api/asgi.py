@@ -3,6 +3,14 @@ ASGI config for social_media_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server instead of the WSGI one, e.g.:
+
+    gunicorn social_media_api.asgi:application -k uvicorn_worker.UvicornWorker
+
+The feed, the notification list and the like/unlike views are async (see
+social_media_api/async_views.py) and wait for the database without holding a
+thread; the other views run in worker threads.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -14,3 +22,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
 
 application = get_asgi_application()
+
+# Started with the server rather than on the first like, so that the likes
+# logged by dead processes are written at once (see posts/likes.py)
+from posts.likes import get_like_buffer  # noqa: E402
+
+get_like_buffer()
@@ -0,0 +1,90 @@
+"""
+Async DRF views.
+
+DRF's APIView is synchronous. AsyncAPIViewMixin gives a view (or viewset) an
+async dispatch(): the request is authenticated, permission-checked and
+throttled by DRF's own sync code in a worker thread, then async handlers run
+on the event loop and sync handlers in a worker thread. The view can be
+routed as usual, under ASGI or WSGI (where Django runs it in an event loop
+per request).
+
+Async handlers must not touch the database from sync code: use the async ORM
+(aget(), acreate(), `async for`, ...) and sync_to_async() for the rest, e.g.
+serializer.data on model instances whose relations are not loaded yet.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from rest_framework.response import Response
+
+from .fastpath import FastPathListMixin, compile_serializer
+
+
+class AsyncAPIViewMixin:
+    """APIView / ViewSet mixin, see the module docstring."""
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        view = super().as_view(*args, **initkwargs)
+        # Viewsets (and views with sync handlers only) are not detected by Django
+        if not iscoroutinefunction(view):
+            markcoroutinefunction(view)
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        # APIView.dispatch(), with the sync parts off the event loop
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncListModelMixin:
+    """
+    Async ListModelMixin.list(). Rows are fetched with the async ORM, through
+    the compiled serializer if the view also uses FastPathListMixin (list
+    this mixin first).
+    """
+
+    async def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        compiled = None
+        if isinstance(self, FastPathListMixin):
+            compiled = compile_serializer(self.get_serializer())
+        if compiled is not None:
+            queryset = compiled.values(queryset)
+
+        rows = None
+        if self.paginator is not None:
+            rows = await sync_to_async(self.paginate_queryset)(queryset)
+        paginated = rows is not None
+        if not paginated:
+            rows = [row async for row in queryset]
+
+        if compiled is not None:
+            data = compiled.to_representation(rows)
+        else:
+            # Relations the queryset did not select_related() are loaded lazily
+            data = await sync_to_async(lambda: self.get_serializer(rows, many=True).data)()
+
+        if paginated:
+            return self.get_paginated_response(data)
+        return Response(data)
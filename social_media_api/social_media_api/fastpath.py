@@ -0,0 +1,217 @@
+"""
+Read-only fast path for hot list endpoints.
+
+A serializer's fields are compiled once into a values_list() query and a
+row-to-dict function, so listing N objects skips model instantiation and the
+per-row get_attribute()/to_representation() walk over field objects. The
+output is the same as the serializer's own to_representation().
+
+Only plain columns, forward relations (e.g. source='author.username') and
+primary key related fields can be compiled. Serializers with anything else
+(method fields, nested serializers, file fields, ...) or with their own
+to_representation() are not compiled and the view falls back to the regular
+serializer.
+
+What is compiled is cached per serializer class and field selection: field
+names, sources and whether each column needs converting. The converting
+fields are taken from the serializer of each request, with its context.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+# Field pairs whose to_representation() returns the database value unchanged
+IDENTITY_FIELDS = (
+    (serializers.CharField, (models.CharField, models.TextField)),
+    (serializers.IntegerField, (models.IntegerField,)),
+    (serializers.BooleanField, (models.BooleanField,)),
+)
+
+# Fields whose representation needs more than the column value
+UNSUPPORTED_FIELDS = (
+    serializers.BaseSerializer,
+    serializers.SerializerMethodField,
+    serializers.FileField,
+    serializers.HiddenField,
+    serializers.ManyRelatedField,
+)
+
+# {(serializer class, field names): (names, paths, converted) or None}
+_plans = {}
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def resolve_model_field(model, field):
+    """Returns the model field behind a serializer field's dotted source."""
+    opts = model._meta
+    attrs = field.source_attrs
+    if field.source == '*' or not attrs:
+        raise NotCompilable(field.field_name)
+
+    for position, attr in enumerate(attrs):
+        try:
+            model_field = opts.get_field(attr)
+        except FieldDoesNotExist:
+            raise NotCompilable(field.field_name)
+        if not model_field.concrete or model_field.many_to_many:
+            raise NotCompilable(field.field_name)
+
+        if position < len(attrs) - 1:
+            # A null relation would make DRF skip or null the field; keep it simple
+            if not model_field.is_relation or model_field.null:
+                raise NotCompilable(field.field_name)
+            opts = model_field.related_model._meta
+
+    return model_field
+
+
+def overrides(obj, name, *bases):
+    """Whether `obj`'s class defines its own `name` method, rather than one of `bases`'."""
+    return all(getattr(type(obj), name) is not getattr(base, name) for base in bases)
+
+
+def needs_conversion(field, model_field):
+    """Returns False when the column value can be used as the representation."""
+    if isinstance(field, UNSUPPORTED_FIELDS):
+        raise NotCompilable(field.field_name)
+    # The column replaces what get_attribute() would read
+    if overrides(field, 'get_attribute', serializers.Field, serializers.RelatedField):
+        raise NotCompilable(field.field_name)
+
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        # values_list() on the foreign key already returns the pk
+        if (field.pk_field is not None or not model_field.is_relation
+                or overrides(field, 'to_representation', serializers.PrimaryKeyRelatedField)):
+            raise NotCompilable(field.field_name)
+        return False
+    if isinstance(field, serializers.RelatedField) or model_field.is_relation:
+        raise NotCompilable(field.field_name)
+
+    if isinstance(field, serializers.ReadOnlyField):
+        return overrides(field, 'to_representation', serializers.ReadOnlyField)
+    for serializer_field, model_fields in IDENTITY_FIELDS:
+        if type(field) is serializer_field and isinstance(model_field, model_fields):
+            return False
+    return True
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation() for ISO 8601 output, with the timezone
+    looked up once per batch instead of once per value.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.utcoffset() is None:
+            return field.to_representation(value)
+        try:
+            value = value.astimezone(field_timezone).isoformat()
+        except OverflowError:
+            return field.to_representation(value)
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return convert
+
+
+def get_converter(field):
+    """Returns the function applied to the non-null values of a column."""
+    if type(field) is serializers.DateTimeField:
+        return datetime_converter(field)
+    return field.to_representation
+
+
+def compile_plan(serializer):
+    """
+    Returns the field names, values_list() paths and, for each column,
+    whether it needs converting. Raises NotCompilable.
+    """
+    if overrides(serializer, 'to_representation', serializers.Serializer):
+        raise NotCompilable(type(serializer).__name__)
+
+    model = serializer.Meta.model
+    names, paths, converted = [], [], []
+    for field in serializer._readable_fields:
+        model_field = resolve_model_field(model, field)
+        names.append(field.field_name)
+        paths.append('__'.join(field.source_attrs))
+        converted.append(needs_conversion(field, model_field))
+    return tuple(names), tuple(paths), tuple(converted)
+
+
+class CompiledSerializer:
+    """A serializer's readable fields as a values_list() query plus a row converter."""
+
+    def __init__(self, serializer, plan):
+        self.names, self.paths, converted = plan
+        fields = serializer.fields
+        # The field to convert each column with, or None to use the value as is
+        self.fields = [fields[name] if convert else None for name, convert in zip(self.names, converted)]
+
+    def values(self, queryset):
+        return queryset.values_list(*self.paths)
+
+    def to_representation(self, rows):
+        names = self.names
+        if not any(self.fields):
+            return [dict(zip(names, row)) for row in rows]
+
+        # Converters are built per call, as they depend on the active timezone
+        columns = [
+            (name, field and get_converter(field))
+            for name, field in zip(names, self.fields)
+        ]
+        return [
+            {
+                name: value if convert is None or value is None else convert(value)
+                for (name, convert), value in zip(columns, row)
+            }
+            for row in rows
+        ]
+
+
+def compile_serializer(serializer):
+    """
+    Returns the CompiledSerializer for a (possibly field-pruned) serializer
+    instance, or None if it cannot be compiled. What is compiled is cached per
+    serializer class and field selection; the instance's own fields convert
+    the values.
+    """
+    key = (type(serializer), tuple(serializer.fields))
+    if key not in _plans:
+        try:
+            _plans[key] = compile_plan(serializer)
+        except NotCompilable:
+            _plans[key] = None
+    plan = _plans[key]
+    return None if plan is None else CompiledSerializer(serializer, plan)
+
+
+class FastPathListMixin:
+    """
+    Opt-in mixin for list views: serves list() through the compiled serializer
+    when possible and through the regular serializer otherwise.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = compile_serializer(self.get_serializer())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = compiled.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.to_representation(page))
+
+        return Response(compiled.to_representation(rows))
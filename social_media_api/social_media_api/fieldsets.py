@@ -0,0 +1,123 @@
+"""
+Sparse fieldsets for the API.
+
+Clients pick the fields they want with ?fields=id,title or drop some with
+?exclude=content. The serializer mixin prunes its fields, and the view mixin
+pushes the same selection into QuerySet.only() so unused columns (e.g. the
+Post.content text) are never read from the database.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def parse_field_list(value):
+    """Turns 'id, title,' into ['id', 'title']."""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def select_fields(data, request):
+    """
+    Applies the ?fields= / ?exclude= of `request` to already serialized data,
+    as SparseFieldsetSerializerMixin does to its fields; returns a new dict.
+    """
+    fields = parse_field_list(request.query_params.get('fields'))
+    exclude = set(parse_field_list(request.query_params.get('exclude')))
+    return {
+        name: value for name, value in data.items()
+        if (not fields or name in fields) and name not in exclude
+    }
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer mixin that keeps only the requested fields.
+
+    The selection comes from the `fields` / `exclude` keyword arguments, or
+    from the ?fields= / ?exclude= query parameters of a GET request.
+    Unknown field names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        exclude = kwargs.pop('exclude', None)
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if fields is None and exclude is None and request is not None and request.method == 'GET':
+            fields = parse_field_list(request.query_params.get('fields'))
+            exclude = parse_field_list(request.query_params.get('exclude'))
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in exclude or []:
+            self.fields.pop(name, None)
+
+
+def get_only_fields(serializer):
+    """
+    Returns the model field paths needed to render `serializer`, and the
+    relations to select_related for them.
+    Returns (None, None) when a field cannot be mapped to a model column
+    (method fields, properties, source='*'), in which case nothing is deferred.
+    """
+    model = serializer.Meta.model
+    only = {model._meta.pk.name}
+    related = set()
+
+    for field in serializer.fields.values():
+        if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            return None, None
+
+        opts = model._meta
+        path = []
+        for position, attr in enumerate(field.source_attrs):
+            try:
+                model_field = opts.get_field(attr)
+            except FieldDoesNotExist:
+                return None, None
+            path.append(attr)
+
+            # Reverse and many-to-many relations are loaded by their own query
+            if model_field.many_to_many or model_field.one_to_many or (
+                    model_field.one_to_one and not model_field.concrete):
+                path = None
+                break
+            # Generic foreign keys and other virtual fields
+            if not model_field.concrete:
+                return None, None
+
+            is_last = position == len(field.source_attrs) - 1
+            if model_field.is_relation and not is_last:
+                related.add('__'.join(path))
+                opts = model_field.related_model._meta
+
+        if path:
+            only.add('__'.join(path))
+
+    return only, related
+
+
+def sparse_queryset(queryset, serializer):
+    """Restricts `queryset` to the columns `serializer` will actually render."""
+    only, related = get_only_fields(serializer)
+    if only is None:
+        return queryset
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*only)
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin for GenericAPIView subclasses: on GET requests the queryset is
+    narrowed with only() to the fields of the (pruned) serializer.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method != 'GET':
+            return queryset
+        return sparse_queryset(queryset, self.get_serializer())
@@ -0,0 +1,103 @@
+"""
+Process-local caching of hot keys.
+
+A HotKeyCache counts the lookups of each key in a count-min sketch, which
+takes the same memory however many keys there are, over the current and the
+previous `window` seconds. A key looked up `threshold` times in that span is
+hot: its value is kept in the process for `ttl` seconds, and loaded through
+a SingleFlight (see singleflight.py), so concurrent misses of the key run
+the load once and share its result. Other keys are loaded by every lookup,
+as without the cache.
+
+The values are shared by threads: treat them as read-only.
+"""
+import threading
+import time
+
+from .singleflight import SingleFlight
+
+
+class CountMinSketch:
+    """Approximate counts in `depth` rows of `width` counters; never undercounts."""
+
+    def __init__(self, width=1024, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def indexes(self, key):
+        return [hash((row, key)) % self.width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Counts `key`; returns its new estimate."""
+        estimate = None
+        for row, index in zip(self.rows, self.indexes(key)):
+            row[index] += count
+            estimate = row[index] if estimate is None else min(estimate, row[index])
+        return estimate
+
+    def estimate(self, key):
+        return min(row[index] for row, index in zip(self.rows, self.indexes(key)))
+
+    def clear(self):
+        for row in self.rows:
+            row[:] = [0] * self.width
+
+
+class HotKeyCache:
+    """See the module docstring."""
+
+    def __init__(self, threshold, ttl, window=10, size=1000, width=1024, depth=4):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.window = window
+        self.size = size
+        self.lock = threading.Lock()
+        self.current = CountMinSketch(width, depth)
+        self.previous = CountMinSketch(width, depth)
+        self.window_started = time.monotonic()
+        # {key: (expires, value)}, oldest first
+        self.entries = {}
+        # Bumped by invalidate(): a load started before is not stored
+        self.generation = 0
+        self.flight = SingleFlight()
+
+    def get(self, key, load):
+        """The value of `key`, from the cache if the key is hot, else from load()."""
+        now = time.monotonic()
+        with self.lock:
+            if now - self.window_started >= self.window:
+                self.current, self.previous = self.previous, self.current
+                self.current.clear()
+                self.window_started = now
+            lookups = self.current.add(key) + self.previous.estimate(key)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        if lookups < self.threshold:
+            return load()
+        return self.flight.do(key, lambda: self.load(key, load))
+
+    def load(self, key, load):
+        generation = self.generation
+        value = load()
+        with self.lock:
+            if generation == self.generation:
+                self.entries.pop(key, None)
+                self.entries[key] = (time.monotonic() + self.ttl, value)
+                if len(self.entries) > self.size:
+                    del self.entries[next(iter(self.entries))]
+        return value
+
+    def invalidate(self, key):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.current.clear()
+            self.previous.clear()
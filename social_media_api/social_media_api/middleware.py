@@ -0,0 +1,193 @@
+"""
+Project wide middleware.
+"""
+import secrets
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Text payloads worth compressing; images, archives, video etc. are already compressed
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+
+
+def parse_accept_encoding(header):
+    """Returns the encodings accepted by the client (q=0 means refused)."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def is_compressible(content_type):
+    content_type = content_type.split(';')[0].strip().lower()
+    return content_type.endswith('+json') or content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def brotli_padding(max_random_bytes):
+    """
+    A metadata meta-block of 1 to max_random_bytes (at most 256) zero bytes,
+    which decoders skip. Inserted at a byte-aligned meta-block boundary, it
+    randomizes the compressed length like the random file name of
+    compress_string(max_random_bytes=...) does for gzip.
+    """
+    length = secrets.randbelow(min(max_random_bytes, 256)) + 1
+    # ISLAST=0, MNIBBLES=0 (11), reserved 0, MSKIPBYTES=1, then MSKIPLEN-1
+    # on 8 bits and zero bits up to the byte boundary
+    return bytes([0b010110 | ((length - 1) & 0b11) << 6, (length - 1) >> 2]) + bytes(length)
+
+
+def brotli_compress(data, quality, max_random_bytes):
+    compressor = brotli.Compressor(quality=quality)
+    # The stream header, flushed to the byte boundary the padding needs
+    return compressor.flush() + brotli_padding(max_random_bytes) + compressor.process(data) + compressor.finish()
+
+
+def brotli_sequence(sequence, quality, max_random_bytes):
+    """Compresses a streamed response, flushing after each chunk."""
+    compressor = brotli.Compressor(quality=quality)
+    yield compressor.flush() + brotli_padding(max_random_bytes)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def abrotli_sequence(sequence, quality, max_random_bytes):
+    compressor = brotli.Compressor(quality=quality)
+    yield compressor.flush() + brotli_padding(max_random_bytes)
+    async for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def agzip_sequence(sequence, max_random_bytes):
+    async for chunk in sequence:
+        yield compress_string(chunk, max_random_bytes=max_random_bytes)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses text responses (API JSON, feeds, exports) with brotli or gzip,
+    whichever the client accepts (brotli preferred, if installed).
+
+    Responses smaller than COMPRESSION_MIN_SIZE bytes, responses that already
+    have a Content-Encoding (e.g. WhiteNoise's precompressed static files) and
+    non-text media are left alone. Streaming responses are compressed chunk
+    by chunk.
+    """
+    # Same BREACH mitigation as django.middleware.gzip.GZipMiddleware: the
+    # compressed length is padded by up to this many random bytes, for gzip
+    # and brotli (see brotli_padding())
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+    def choose_encoding(self, request):
+        accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        if not is_compressible(response.get('Content-Type', '')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            content = response.streaming_content
+            if encoding == 'br' and response.is_async:
+                response.streaming_content = abrotli_sequence(content, self.brotli_quality, self.max_random_bytes)
+            elif encoding == 'br':
+                response.streaming_content = brotli_sequence(content, self.brotli_quality, self.max_random_bytes)
+            elif response.is_async:
+                response.streaming_content = agzip_sequence(content, self.max_random_bytes)
+            else:
+                response.streaming_content = compress_sequence(content, max_random_bytes=self.max_random_bytes)
+            # The compressed size is only known once the stream is consumed
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed_content = brotli_compress(response.content, self.brotli_quality, self.max_random_bytes)
+            else:
+                compressed_content = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            # Only keep the compressed content if it's actually shorter
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        # A strong ETag has to become weak once the body is re-encoded
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that can also run in an async middleware chain,
+    where a sync-only middleware would hold a thread for every request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,213 @@
+"""
+Opt-in sampling profiler for slow endpoints.
+
+ProfilingMiddleware samples the Python stack of a request's thread every
+PROFILING_INTERVAL_MS from a background thread, and adds the samples of each
+profiled request to the collapsed-stack file of its view,
+PROFILING_OUTPUT_DIR/<view name>.collapsed ("frame;frame;frame count" lines,
+the input format of flamegraph.pl, speedscope, inferno, ...).
+
+A request is profiled when:
+- it sends `X-Profile: <PROFILING_TOKEN>` (ignored when no token is set), or
+- it is picked at random, with probability PROFILING_SAMPLE_RATE, or
+- it runs longer than PROFILING_THRESHOLD_MS; sampling then starts at the
+  threshold, so only the slow part of the request is captured.
+
+With no token, a zero sample rate and no threshold (the defaults) the
+middleware only passes the request on.
+
+Under ASGI, the sampled thread is the one running the request's sync code:
+ASGIHandler runs all the thread-sensitive sync_to_async() calls of a request
+in one thread, which holds the sync views and middleware and the ORM queries
+of async views (FeedAPIView's included). Finding it costs each profiled
+request (each request, with a threshold) one sync_to_async() call. Only the
+samples taken while that thread works for the request are kept. The time
+spent in coroutines on the event loop, shared by all requests, is not
+sampled. Async views profiled under WSGI only show the request thread
+waiting for the event loop.
+"""
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from .instrumentation import view_label
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+# In the stack of a thread running a sync_to_async() call
+SYNC_TO_ASYNC_FRAME = 'asgiref.sync:SyncToAsync.thread_handler'
+
+
+def frame_name(frame):
+    code = frame.f_code
+    # co_qualname (Class.method) is new in Python 3.11
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}:{name}"
+
+
+def collapse(frame):
+    """Returns the stack of `frame` as 'root;...;leaf'."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class RequestProfile:
+
+    def __init__(self, forced, started, busy_frame=None):
+        self.forced = forced
+        self.started = started
+        # Only the stacks containing this frame are counted (None: all)
+        self.busy_frame = busy_frame
+        self.stacks = Counter()
+
+
+class Sampler:
+    """One daemon thread sampling the registered request threads."""
+
+    def __init__(self, interval, threshold):
+        self.interval = interval
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.thread = None
+
+    def register(self, thread_id, profile):
+        with self.lock:
+            self.profiles[thread_id] = profile
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+                self.thread.start()
+
+    def unregister(self, thread_id):
+        with self.lock:
+            return self.profiles.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.profiles:
+                    continue
+                now = time.perf_counter()
+                due = [
+                    (thread_id, profile) for thread_id, profile in self.profiles.items()
+                    if profile.forced or (self.threshold is not None and now - profile.started >= self.threshold)
+                ]
+            if not due:
+                continue
+
+            # Formatted without the lock, which the request threads wait on
+            frames = sys._current_frames()
+            samples = []
+            for thread_id, profile in due:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stack = collapse(frame)
+                    if profile.busy_frame is None or profile.busy_frame in stack:
+                        samples.append((thread_id, profile, stack))
+            del frames
+
+            # Counted under the lock: a profile is never updated after unregister()
+            with self.lock:
+                for thread_id, profile, stack in samples:
+                    if self.profiles.get(thread_id) is profile:
+                        profile.stacks[stack] += 1
+
+
+class CollapsedStackStore:
+    """Per-view sample totals, rewritten to one file per view on each capture."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def path(self, view):
+        safe_name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in view)
+        return os.path.join(self.directory, f'{safe_name}.collapsed')
+
+    def add(self, view, stacks):
+        with self.lock:
+            totals = self.views.setdefault(view, Counter())
+            totals.update(stacks)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(view), 'w') as f:
+                for stack, count in totals.most_common():
+                    f.write(f'{stack} {count}\n')
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        self.token = getattr(settings, 'PROFILING_TOKEN', None)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        threshold_ms = getattr(settings, 'PROFILING_THRESHOLD_MS', None)
+        self.threshold = threshold_ms / 1000 if threshold_ms is not None else None
+        self.enabled = bool(self.token or self.sample_rate or self.threshold is not None)
+
+        interval = getattr(settings, 'PROFILING_INTERVAL_MS', 5) / 1000
+        self.sampler = Sampler(interval, self.threshold)
+        self.store = CollapsedStackStore(getattr(settings, 'PROFILING_OUTPUT_DIR', 'profiles'))
+
+    def is_forced(self, request):
+        header = request.META.get(PROFILE_HEADER)
+        if header and self.token and hmac.compare_digest(header, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        forced = self.is_forced(request)
+        if not forced and self.threshold is None:
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        self.sampler.register(thread_id, RequestProfile(forced, time.perf_counter()))
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = self.sampler.unregister(thread_id)
+        return self.save(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        forced = self.is_forced(request)
+        if not forced and self.threshold is None:
+            return await self.get_response(request)
+
+        # The request's sync thread, see the module docstring
+        thread_id = await sync_to_async(threading.get_ident)()
+        self.sampler.register(thread_id, RequestProfile(forced, time.perf_counter(), SYNC_TO_ASYNC_FRAME))
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile = self.sampler.unregister(thread_id)
+        return self.save(request, response, profile)
+
+    def save(self, request, response, profile):
+        if profile.stacks:
+            self.store.add(view_label(request), profile.stacks)
+        if profile.forced:
+            response.headers['X-Profile-Samples'] = str(sum(profile.stacks.values()))
+        return response
@@ -0,0 +1,75 @@
+"""
+orjson based JSON renderer and parser.
+
+Drop-in replacements for DRF's JSONRenderer / JSONParser, selected in the
+REST_FRAMEWORK settings. Output decodes to the same values as
+JSONRenderer's: datetimes, decimals, lazy translation strings and other
+types orjson does not handle the same way are passed to DRF's own
+JSONEncoder, and integers beyond 64 bits fall back to JSONRenderer.
+
+It is not byte for byte the same:
+
+- Floats (and decimals, which DRF's JSONEncoder turns into floats) have the
+  same digits, but orjson switches to exponents at other magnitudes and
+  writes them shorter: 1e16 and 0.00001 where JSONRenderer writes 1e+16
+  and 1e-05. Both parse to the same float.
+- NaN and infinite floats are rendered as null, where JSONRenderer raises
+  ValueError (or writes NaN with STRICT_JSON off).
+
+If orjson is not installed, or the response asks for something orjson
+cannot do (indent=4 in the browsable API, ASCII-only or non-compact
+output), both classes fall back to the stdlib json implementation.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits; other errors are raised again
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, so the output is a strict javascript subset
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            data = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,163 @@
+"""
+Read replicas for the read-heavy endpoints.
+
+Views with ReplicaReadMixin run their GET/HEAD/OPTIONS requests against a
+random alias of DATABASE_REPLICAS; everything else, and every write, uses
+the default (primary) database.
+
+Replicas lag behind the primary, so after a successful write request
+ReplicaPinMiddleware pins the client to the primary for REPLICA_PIN_SECONDS:
+a user always reads their own writes. The pin is a cookie, and for an
+authenticated user also a cache key, as token clients seldom keep cookies.
+The views only know that user once authenticated, so their authentication
+itself may still read from a replica. The cache key pins the user on every
+worker only if the cache is shared (CACHE_URL); otherwise, on the worker
+that took the write.
+
+To try it locally, with two SQLite files standing in for the primary and a
+replica (the copy, which includes the writes still in the WAL file, is the
+"replication"):
+
+    sqlite3 db.sqlite3 '.backup replica.sqlite3'
+    DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3 python manage.py runserver
+
+Replicas are never migrated (they receive the schema from the primary) and
+are test mirrors of the default database.
+"""
+import inspect
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_pin'
+PIN_CACHE_KEY = 'replicas:pin:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaReads:
+    """Whether the reads of a request go to a replica.
+
+    Mutable rather than a plain flag in the context variable, so that
+    turning it off also reaches the context the async views run in.
+    """
+
+    def __init__(self):
+        self.enabled = True
+
+
+@contextmanager
+def replica_reads():
+    """Sends the reads made in the block to a replica."""
+    state = ReplicaReads()
+    token = _replica_reads.set(state)
+    try:
+        yield state
+    finally:
+        _replica_reads.reset(token)
+
+
+async def on_replica(coroutine):
+    with replica_reads():
+        return await coroutine
+
+
+def is_pinned(request):
+    """Whether the client wrote in the last REPLICA_PIN_SECONDS."""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def is_user_pinned(user):
+    """Whether the user wrote in the last REPLICA_PIN_SECONDS, from any client."""
+    return user is not None and user.is_authenticated and cache.get(PIN_CACHE_KEY.format(user.pk), False)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        # Inside a transaction the reads have to see its writes
+        state = _replica_reads.get()
+        if replicas and state is not None and state.enabled and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Not the database the instance was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
+
+
+class ReplicaReadMixin:
+    """View mixin: safe requests read from a replica, unless the client is pinned."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or not get_replicas() or is_pinned(request):
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            response = super().dispatch(request, *args, **kwargs)
+        # Async views only run once awaited
+        if inspect.iscoroutine(response):
+            return on_replica(response)
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Token clients are only known once authenticated
+        state = _replica_reads.get()
+        if state is not None and is_user_pinned(request.user):
+            state.enabled = False
+
+
+class ReplicaPinMiddleware:
+    """Pins a client to the primary database for a while after it writes."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and get_replicas():
+            response.set_cookie(
+                PIN_COOKIE, str(time.time() + self.pin_seconds), max_age=self.pin_seconds,
+                secure=request.is_secure(), httponly=True, samesite='Lax',
+            )
+            # Set on the Django request by DRF's authentication too
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(PIN_CACHE_KEY.format(user.pk), True, self.pin_seconds)
+        return response
@@ -52,22 +52,85 @@ INSTALLED_APPS = [
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# orjson renderer/parser (fall back to the stdlib json encoder if orjson is missing)
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'social_media_api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'social_media_api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# All async-capable: under ASGI, a single sync-only middleware would run
+# every request, async views included, on a blocked thread
 MIDDLEWARE = [
+    # First, so it measures the whole request
+    'social_media_api.instrumentation.InstrumentationMiddleware',
+    'social_media_api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'social_media_api.middleware.AsyncWhiteNoiseMiddleware',
+    # after WhiteNoise, which serves its own precompressed static files
+    'social_media_api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'social_media_api.replicas.ReplicaPinMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Requests slower than this (in milliseconds) are logged by the instrumentation middleware
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+
+# Bearer token to scrape the Prometheus metrics at /metrics/ (disabled if empty),
+# e.g. bearer_token in the Prometheus scrape config
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Sampling profiler (see social_media_api/profiling.py), off unless configured:
+# requests sending "X-Profile: <PROFILING_TOKEN>", a random PROFILING_SAMPLE_RATE
+# share of requests, and requests slower than PROFILING_THRESHOLD_MS are profiled
+# (under ASGI, only the requests' sync code: views, middleware and ORM queries)
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_THRESHOLD_MS = int(os.environ['PROFILING_THRESHOLD_MS']) if os.getenv('PROFILING_THRESHOLD_MS') else None
+PROFILING_INTERVAL_MS = 5
+PROFILING_OUTPUT_DIR = BASE_DIR / 'profiles'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        # Slow request records are already JSON
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'instrumentation': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'social_media_api.instrumentation': {
+            'handlers': ['instrumentation'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 
+# Responses smaller than this (in bytes) are not compressed
+COMPRESSION_MIN_SIZE = 1024
+
 ROOT_URLCONF = 'social_media_api.urls'
 
 TEMPLATES = [
@@ -93,15 +156,95 @@ WSGI_APPLICATION = 'social_media_api.wsgi.application'
 
 import dj_database_url
 
-DATABASES = {
-    'default': dj_database_url.config(
-        # This looks for a variable named DATABASE_URL in your .env
-        # If it doesn't find it, it falls back to your local sqlite
-        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
-        conn_max_age=600
+from social_media_api.sqlite import parse_pragmas, sqlite_options
+
+# Database connections, configured from the environment:
+# - DATABASE_CONN_MAX_AGE: seconds a worker keeps its connection open (0 closes
+#   it after every request)
+# - DATABASE_CONN_HEALTH_CHECKS: check a kept or pooled connection before reusing
+#   it, so connections broken by a database failover are replaced instead of
+#   failing requests until the workers recycle
+# - DATABASE_POOL=true (PostgreSQL with psycopg 3): a pool of DATABASE_POOL_MIN_SIZE
+#   to DATABASE_POOL_MAX_SIZE connections per worker process instead, replaced
+#   after DATABASE_POOL_MAX_LIFETIME seconds; requests wait up to
+#   DATABASE_POOL_TIMEOUT seconds for a free connection
+# - SQLITE_PRAGMAS (SQLite): changes to the pragmas of social_media_api/sqlite.py,
+#   e.g. SQLITE_PRAGMAS=synchronous=FULL
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', '600'))
+DATABASE_CONN_HEALTH_CHECKS = os.getenv('DATABASE_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes')
+DATABASE_POOL = os.getenv('DATABASE_POOL', 'false').lower() in ('1', 'true', 'yes')
+DATABASE_POOL_OPTIONS = {
+    'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', '2')),
+    'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', '10')),
+    'max_lifetime': float(os.getenv('DATABASE_POOL_MAX_LIFETIME', '1800')),
+    'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+}
+SQLITE_PRAGMAS = parse_pragmas(os.getenv('SQLITE_PRAGMAS', ''))
+
+
+def database_config(url):
+    config = dj_database_url.parse(
+        url, conn_max_age=DATABASE_CONN_MAX_AGE, conn_health_checks=DATABASE_CONN_HEALTH_CHECKS,
     )
+    if DATABASE_POOL and config['ENGINE'] == 'django.db.backends.postgresql':
+        # Connections go back to the pool at the end of each request
+        config['CONN_MAX_AGE'] = 0
+        config.setdefault('OPTIONS', {})['pool'] = dict(DATABASE_POOL_OPTIONS)
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        config.setdefault('OPTIONS', {}).update(sqlite_options(**SQLITE_PRAGMAS))
+    return config
+
+
+DATABASES = {
+    # This looks for a variable named DATABASE_URL in your .env
+    # If it doesn't find it, it falls back to your local sqlite
+    'default': database_config(os.getenv('DATABASE_URL', f"sqlite:///{BASE_DIR / 'db.sqlite3'}")),
 }
 
+# Read replicas for the read-heavy endpoints (see social_media_api/replicas.py),
+# e.g. DATABASE_REPLICA_URLS=postgres://replica1/db,postgres://replica2/db
+DATABASE_REPLICAS = []
+for position, url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica{position}'] = database_config(url)
+    DATABASES[f'replica{position}']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(f'replica{position}')
+
+DATABASE_ROUTERS = ['social_media_api.replicas.ReplicaRouter']
+
+# Seconds a client reads from the primary database after a write
+REPLICA_PIN_SECONDS = 5
+
+# Cache shared by the worker processes, e.g. CACHE_URL=redis://127.0.0.1:6379/0
+# (needs redis-py). Without it each process has its own cache, and a user's replica pin
+# (see social_media_api/replicas.py) only holds on the worker that took the write
+CACHE_URL = os.getenv('CACHE_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Hot posts (see posts/caching.py): a post retrieved HOT_POST_THRESHOLD times
+# within HOT_POST_WINDOW_SECONDS is served from the memory of each worker for
+# HOT_POST_CACHE_SECONDS, for up to HOT_POST_CACHE_SIZE posts
+HOT_POST_THRESHOLD = int(os.getenv('HOT_POST_THRESHOLD', '50'))
+HOT_POST_WINDOW_SECONDS = 10
+HOT_POST_CACHE_SECONDS = float(os.getenv('HOT_POST_CACHE_SECONDS', '1'))
+HOT_POST_CACHE_SIZE = 1000
+
+# Write-behind likes (see posts/likes.py), off unless LIKE_WRITE_BEHIND=true:
+# the like views answer at once, and the likes are written in batches every
+# LIKE_WRITE_BEHIND_FLUSH_MS. Until then they are logged to files in
+# LIKE_WRITE_BEHIND_LOG_DIR (none if empty), fsynced with LIKE_WRITE_BEHIND_FSYNC=true
+LIKE_WRITE_BEHIND = os.getenv('LIKE_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+LIKE_WRITE_BEHIND_FLUSH_MS = int(os.getenv('LIKE_WRITE_BEHIND_FLUSH_MS', '5'))
+LIKE_WRITE_BEHIND_LOG_DIR = os.getenv('LIKE_WRITE_BEHIND_LOG_DIR', str(BASE_DIR / 'likes'))
+LIKE_WRITE_BEHIND_FSYNC = os.getenv('LIKE_WRITE_BEHIND_FSYNC', 'false').lower() in ('1', 'true', 'yes')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -148,6 +291,9 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # 1. Force HTTPS
 SECURE_SSL_REDIRECT = True
+# A Prometheus on the same host may scrape the metrics over plain HTTP; from
+# elsewhere, use HTTPS: the bearer token (METRICS_TOKEN) would travel in clear
+SECURE_REDIRECT_EXEMPT = [r'^metrics/$']
 
 # 2. Protect Cookies (Crucial!)
 SESSION_COOKIE_SECURE = True
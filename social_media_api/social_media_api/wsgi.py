@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
 
 application = get_wsgi_application()
+
+# Started with the server rather than on the first like, so that the likes
+# logged by dead processes are written at once (see posts/likes.py)
+from posts.likes import get_like_buffer  # noqa: E402
+
+get_like_buffer()